@@ -12,6 +12,11 @@ class OccurrenceInline(StackedDynamicInlineAdmin):
 
     fields = ('start_time', 'end_time', 'description', 'location')
 
+class RecurrenceRuleInline(StackedDynamicInlineAdmin):
+    model = RecurrenceRule
+
+    fields = ('rule', 'start_time', 'end_time')
+
 class EventAdmin(DisplayableAdmin):
     list_display = ('publish_date', 'title', 'status')
     search_fields = ('title', 'description', 'content')
@@ -33,7 +38,7 @@ class EventAdmin(DisplayableAdmin):
         }),
     )
 
-    inlines = [OccurrenceInline]
+    inlines = [OccurrenceInline, RecurrenceRuleInline]
 
 admin.site.register(Event, EventAdmin)
 admin.site.register(EventCategory, EventCategoryAdmin)
@@ -4,3 +4,7 @@ class FullCalendarAppConfig(AppConfig):
     name = "fullcalendar"
     verbose_name = "events"
     label = "events"
+
+    def ready(self):
+        # Connect the cache invalidation, feed table and sync signal handlers
+        from fullcalendar import cache, feed, sync
@@ -0,0 +1,167 @@
+"""
+Versioned caching of calendar data.
+
+All cache keys include a generation number, which is bumped whenever an
+``Event``, ``Occurrence``, ``EventCategory``, recurrence rule or ``Site`` is
+saved or deleted. Bumping the generation makes every previously cached entry
+unreachable, so nothing has to be deleted explicitly; old entries simply
+expire.
+
+Caching is disabled unless ``FULLCALENDAR_CACHE_TIMEOUT`` is set. Since
+publish and expiry dates are not signalled when they pass, the timeout
+bounds how long such a change can go unnoticed.
+
+The agenda template tags are cached separately, for at most
+``FULLCALENDAR_AGENDA_CACHE_TIMEOUT`` seconds, see ``store_agenda``.
+"""
+import hashlib
+import math
+import time
+
+from django.contrib.sites.models import Site
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import six, timezone
+
+from fullcalendar.conf import settings as fullcalendar_settings
+from fullcalendar.models import Event, EventCategory, Occurrence, \
+    RecurrenceException, RecurrenceRule
+
+
+GENERATION_KEY = 'fullcalendar:generation'
+HITS_KEY = 'fullcalendar:hits'
+MISSES_KEY = 'fullcalendar:misses'
+
+
+def get_cache():
+    return caches[fullcalendar_settings.FULLCALENDAR_CACHE_ALIAS]
+
+
+def is_enabled():
+    return bool(fullcalendar_settings.FULLCALENDAR_CACHE_TIMEOUT)
+
+
+def is_agenda_enabled():
+    return bool(fullcalendar_settings.FULLCALENDAR_AGENDA_CACHE_TIMEOUT)
+
+
+def get_generation():
+    """
+    Returns the current generation number.
+
+    A missing counter (e.g. after a cache flush) is started from the current
+    time in milliseconds, so it never returns to an earlier generation.
+    """
+    cache = get_cache()
+    generation = cache.get(GENERATION_KEY)
+
+    if generation is None:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+
+    return generation
+
+
+def bump_generation():
+    """
+    Invalidate all cached calendar data.
+    """
+    try:
+        get_cache().incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def invalidate_all():
+    """
+    Invalidate all cached calendar data and agenda lists, if either cache is
+    enabled. Use this after changes that send no ``post_save`` or
+    ``post_delete`` signal, such as bulk inserts.
+    """
+    if is_enabled() or is_agenda_enabled():
+        bump_generation()
+
+
+def make_key(prefix, *parts):
+    """
+    Returns a cache key for ``parts`` in the current generation.
+
+    The parts are hashed, as they may contain request input that is not
+    valid in a cache key (e.g. spaces for memcached). Text is hashed as
+    UTF-8.
+    """
+    digest = hashlib.md5(u':'.join(
+        six.text_type(part) for part in parts
+    ).encode('utf-8')).hexdigest()
+
+    return 'fullcalendar:%s:%s:%s' % (prefix, get_generation(), digest)
+
+
+def count(key):
+    try:
+        get_cache().incr(key)
+    except ValueError:
+        get_cache().add(key, 1, None)
+
+
+def fetch(key):
+    """
+    Returns the cached value for ``key`` or ``None``, and updates the hit
+    and miss counters.
+    """
+    value = get_cache().get(key)
+    count(MISSES_KEY if value is None else HITS_KEY)
+
+    return value
+
+
+def store(key, value, timeout=None):
+    if timeout is None:
+        timeout = fullcalendar_settings.FULLCALENDAR_CACHE_TIMEOUT
+
+    get_cache().set(key, value, timeout)
+
+
+def store_agenda(key, occurrences):
+    """
+    Caches a list of upcoming occurrences until the first of them starts,
+    and so drops out of the agenda, or for
+    ``FULLCALENDAR_AGENDA_CACHE_TIMEOUT`` seconds if that is sooner.
+    """
+    timeout = fullcalendar_settings.FULLCALENDAR_AGENDA_CACHE_TIMEOUT
+
+    if occurrences:
+        starts_in = (occurrences[0].start_time - timezone.now()).total_seconds()
+        timeout = max(1, min(timeout, int(math.ceil(starts_in))))
+
+    store(key, occurrences, timeout)
+
+
+def get_stats():
+    """
+    Returns the cache hit and miss counters for monitoring.
+    """
+    stats = get_cache().get_many([HITS_KEY, MISSES_KEY])
+
+    return {
+        'generation': get_generation(),
+        'hits': stats.get(HITS_KEY, 0),
+        'misses': stats.get(MISSES_KEY, 0),
+    }
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=EventCategory)
+@receiver(post_save, sender=Occurrence)
+@receiver(post_save, sender=RecurrenceRule)
+@receiver(post_save, sender=RecurrenceException)
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=EventCategory)
+@receiver(post_delete, sender=Occurrence)
+@receiver(post_delete, sender=RecurrenceRule)
+@receiver(post_delete, sender=RecurrenceException)
+@receiver(post_delete, sender=Site)
+def invalidate(sender, **kwargs):
+    invalidate_all()
@@ -0,0 +1,115 @@
+"""
+The compact format of the calendar feed, requested with ``format=compact``.
+
+Instead of a list of event objects, the feed is returned as columns, with
+whatever is the same for all occurrences of an event stored once::
+
+    {
+        "events": [[id, title, url prefix, url suffix, color], ...],
+        "colors": [{"color": "#abc"}, ...],
+        "event": [0, 0, 1, ...],
+        "key": [12, 13, 40, ...],
+        "start": [1451642400, ...],
+        "end": [1451649600, ...],
+        "titles": {"2": "Other title"}
+    }
+
+The ``event``, ``key``, ``start`` and ``end`` columns have an item for
+every occurrence: the position of its event in ``events``, the part of its
+URL between the prefix and suffix of the event, and its start and end time
+in seconds since the epoch. ``color`` is a position in ``colors`` or
+``null``. ``titles`` holds the titles of the occurrences whose title is not
+that of their event, by position.
+
+``static/fullcalendar/js/compact-feed.js`` turns this back into event
+objects for fullcalendar.io.
+"""
+import calendar
+
+from django.utils import timezone
+
+
+def timestamps(values):
+    """
+    Returns the datetimes in ``values`` as seconds since the epoch. Naive
+    datetimes are taken to be in the default time zone.
+    """
+    default_timezone = timezone.get_default_timezone()
+
+    return [
+        calendar.timegm((timezone.make_aware(value, default_timezone)
+                         if timezone.is_naive(value) else value
+                         ).utctimetuple())
+        for value in values
+    ]
+
+
+class CompactFeed(object):
+    """
+    Collects occurrences and returns them in the compact format.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.event_index = {}
+        self.colors = []
+        self.color_index = {}
+        self.event = []
+        self.key = []
+        self.start = []
+        self.end = []
+        self.titles = {}
+
+    def get_color(self, colors):
+        if not colors:
+            return None
+
+        color_key = tuple(sorted(colors.items()))
+        if color_key not in self.color_index:
+            self.color_index[color_key] = len(self.colors)
+            self.colors.append(colors)
+
+        return self.color_index[color_key]
+
+    def add(self, event_id, title, start_time, end_time, url_prefix, key,
+            url_suffix, colors):
+        """
+        Adds an occurrence whose URL is ``url_prefix + key + url_suffix``.
+        """
+        event_key = (event_id, url_prefix, url_suffix)
+        index = self.event_index.get(event_key)
+
+        if index is None:
+            index = self.event_index[event_key] = len(self.events)
+            self.events.append([event_id, title, url_prefix, url_suffix,
+                                self.get_color(colors)])
+        elif title != self.events[index][1]:
+            self.titles[str(len(self.event))] = title
+
+        self.event.append(index)
+        self.key.append(key)
+        self.start.append(start_time)
+        self.end.append(end_time)
+
+    def add_url(self, event_id, title, start_time, end_time, url, colors):
+        """
+        Adds an occurrence by its full URL, using its last path segment as
+        the key.
+        """
+        url_suffix = '/' if url.endswith('/') else ''
+        url_prefix, sep, key = url[:len(url) - len(url_suffix)].rpartition(
+            '/')
+
+        self.add(event_id, title, start_time, end_time, url_prefix + sep,
+                 int(key) if key.isdigit() else key, url_suffix, colors)
+
+    def as_data(self):
+        return {
+            'events': self.events,
+            'colors': self.colors,
+            'event': self.event,
+            'key': self.key,
+            'start': timestamps(self.start),
+            'end': timestamps(self.end),
+            'titles': self.titles,
+        }
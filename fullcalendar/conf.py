@@ -1,10 +1,28 @@
 from datetime import timedelta
 
 from django.conf import settings as django_settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import six
 
 default = {
     'FULLCALENDAR_FIRST_WEEKDAY': 0,
     'FULLCALENDAR_OCCURRENCE_DURATION': timedelta(hours=1),
+    'FULLCALENDAR_OCCURRENCE_BUCKETS': None,
+    'FULLCALENDAR_OCCURRENCE_BATCH_SIZE': 500,
+    'FULLCALENDAR_FEED_TABLE': False,
+    'FULLCALENDAR_ICAL_RRULE': False,
+    'FULLCALENDAR_LEAN_JSON': False,
+    'FULLCALENDAR_JSON_ENCODER': None,
+    'FULLCALENDAR_RECURRENCE_HORIZON': timedelta(days=365),
+    'FULLCALENDAR_SYNC_RETENTION': None,
+    'FULLCALENDAR_INSTRUMENTATION': [],
+    'FULLCALENDAR_STATSD_ADDRESS': ('localhost', 8125),
+    'FULLCALENDAR_STATSD_PREFIX': 'fullcalendar',
+    'FULLCALENDAR_CACHE_ALIAS': 'default',
+    'FULLCALENDAR_CACHE_TIMEOUT': 0,
+    'FULLCALENDAR_AGENDA_CACHE_TIMEOUT': 0,
+    'FULLCALENDAR_MAIN_SITE_ID': 1,
     'FULLCALENDAR_SITE_COLORS': {}
 }
 
@@ -13,3 +31,90 @@ settings = type('SettingsDummy', (), default)
 for key, value in default.items():
     setattr(settings, key,
         getattr(django_settings, key, value))
+
+
+# The normalized FULLCALENDAR_SITE_COLORS, see get_site_colors
+_site_colors = {}
+
+
+def normalize_color(color):
+    """
+    Returns a ``FULLCALENDAR_SITE_COLORS`` value, a color, a (color, text
+    color) pair or a (background, text, border color) triple, as a
+    (background, text, border color) triple. The text color is ``None``
+    when not given.
+    """
+    if isinstance(color, six.string_types):
+        color = (color,)
+
+    if len(color) == 1:
+        return (color[0], None, color[0])
+    elif len(color) == 2:
+        return (color[0], color[1], color[0])
+
+    return tuple(color[:3])
+
+
+def get_color_options(color):
+    """
+    Returns the fullcalendar.io event color options for a normalized color.
+    """
+    background, text, border = color
+
+    if background == border:
+        options = {'color': background}
+        if text is not None:
+            options['textColor'] = text
+        return options
+
+    return {
+        'backgroundColor': background,
+        'textColor': text,
+        'borderColor': border,
+    }
+
+
+def get_site_colors():
+    """
+    Returns ``FULLCALENDAR_SITE_COLORS`` as a dictionary mapping site ids to
+    normalized colors, see ``normalize_color``.
+
+    The table is built on first use and rebuilt when the setting changes.
+    """
+    source = settings.FULLCALENDAR_SITE_COLORS
+
+    if _site_colors.get('source') is not source:
+        colors = dict(
+            (site_id, normalize_color(color))
+            for site_id, color in source.items()
+        )
+        _site_colors.clear()
+        _site_colors.update({
+            'source': source,
+            'colors': colors,
+            'options': dict(
+                (site_id, get_color_options(color))
+                for site_id, color in colors.items()
+            ),
+        })
+
+    return _site_colors['colors']
+
+
+def get_site_color_options():
+    """
+    Returns a dictionary mapping site ids to the fullcalendar.io event color
+    options of ``FULLCALENDAR_SITE_COLORS``.
+    """
+    get_site_colors()
+
+    return _site_colors['options']
+
+
+@receiver(setting_changed)
+def reload_settings(setting, **kwargs):
+    if setting in default:
+        setattr(settings, setting,
+                getattr(django_settings, setting, default[setting]))
+        if setting == 'FULLCALENDAR_SITE_COLORS':
+            _site_colors.clear()
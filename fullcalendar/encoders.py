@@ -0,0 +1,49 @@
+"""
+JSON encoders for the JSON views.
+
+``FULLCALENDAR_JSON_ENCODER`` selects the encoder: ``None`` for Django's
+``JsonResponse`` (the default), or a callable, or the dotted path of one,
+taking the data and returning the JSON document as ``bytes`` or ``str``.
+Besides ``fast_dumps`` below, this can be a faster third party encoder
+that handles dictionaries, lists and strings, e.g.::
+
+    FULLCALENDAR_JSON_ENCODER = 'ujson.dumps'
+
+Compare them with the ``benchmark_json_encoders`` management command.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six
+from django.utils.module_loading import import_string
+
+from fullcalendar.conf import settings as fullcalendar_settings
+
+
+def get_encoder():
+    """
+    Returns the configured encoder, or ``None`` for ``JsonResponse``.
+    """
+    encoder = fullcalendar_settings.FULLCALENDAR_JSON_ENCODER
+
+    if isinstance(encoder, six.string_types):
+        encoder = import_string(encoder)
+
+    return encoder
+
+
+def fast_dumps(data):
+    """
+    Encodes ``data`` with the C encoder of the standard library, without
+    spaces after separators and without the check for circular references,
+    which the feed data cannot have. Values the standard library cannot
+    encode are encoded like ``JsonResponse`` does.
+
+    The output is ASCII, so turning it into bytes is a plain copy.
+    """
+    return json.dumps(
+        data,
+        separators=(',', ':'),
+        check_circular=False,
+        default=DjangoJSONEncoder().default
+    ).encode('ascii')
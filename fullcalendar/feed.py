@@ -0,0 +1,41 @@
+"""
+Maintenance of the ``FeedEntry`` table read by the calendar feed when
+``FULLCALENDAR_FEED_TABLE`` is set.
+
+The entries of an occurrence are recreated whenever the occurrence, the
+event category or the site of the event is saved, and by ``Event.save`` when
+a field they are rendered from changes. Deleted occurrences lose their
+entries by cascade. Run the ``rebuild_feed_entries``
+management command after enabling the table or changing the URLs of the
+calendar.
+"""
+from django.contrib.sites.models import Site
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from fullcalendar.conf import settings as fullcalendar_settings
+from fullcalendar.models import EventCategory, FeedEntry, Occurrence
+
+
+def is_enabled():
+    return bool(fullcalendar_settings.FULLCALENDAR_FEED_TABLE)
+
+
+@receiver(post_save, sender=Occurrence)
+def update_occurrence(sender, instance, raw=False, **kwargs):
+    if is_enabled() and not raw:
+        FeedEntry.objects.rebuild(Occurrence.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=EventCategory)
+def update_event_category(sender, instance, raw=False, **kwargs):
+    if is_enabled() and not raw:
+        FeedEntry.objects.rebuild(Occurrence.objects.filter(
+            event__event_category=instance))
+
+
+@receiver(post_save, sender=Site)
+def update_site(sender, instance, raw=False, **kwargs):
+    if is_enabled() and not raw:
+        FeedEntry.objects.rebuild(Occurrence.objects.filter(
+            event__site=instance))
@@ -0,0 +1,21 @@
+"""
+Formatting of occurrence times for the JSON views and the feed table, kept
+apart from the views so the models can use it too.
+"""
+from django.utils import timezone
+
+
+def format_datetimes(values):
+    """
+    Returns the datetimes in ``values`` as ISO 8601 strings without
+    microseconds, e.g. ``2016-01-31T20:00:00+01:00``. Naive datetimes are
+    taken to be in the default time zone.
+    """
+    default_timezone = timezone.get_default_timezone()
+
+    return [
+        (timezone.make_aware(value, default_timezone)
+         if timezone.is_naive(value) else value
+         ).replace(microsecond=0).isoformat()
+        for value in values
+    ]
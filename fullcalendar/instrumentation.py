@@ -0,0 +1,202 @@
+"""
+Opt-in instrumentation of the calendar views.
+
+A measurement records the number of SQL queries and the time spent in the
+database, plus any timings and counters reported by the measured code, such
+as the serialization time and number of rows of the calendar feed. Finished
+measurements are sent with the ``metrics_recorded`` signal and passed to the
+sinks listed in ``FULLCALENDAR_INSTRUMENTATION``, e.g.::
+
+    FULLCALENDAR_INSTRUMENTATION = [
+        'fullcalendar.instrumentation.log_metrics',
+        'fullcalendar.instrumentation.statsd_metrics',
+    ]
+
+A sink is any callable taking the measurement name and a dictionary of
+metrics. Measurements are taken by ``InstrumentationMiddleware`` (whole
+requests, including template tags), ``InstrumentedViewMixin`` and the
+``instrumented`` decorator. Nothing is measured when no sinks are configured.
+"""
+from contextlib import contextmanager
+from functools import wraps
+import logging
+import socket
+import threading
+import time
+
+from django.core.urlresolvers import Resolver404, resolve
+from django.db import connection
+from django.dispatch import Signal
+from django.utils import six
+from django.utils.module_loading import import_string
+
+from fullcalendar.conf import settings as fullcalendar_settings
+
+
+metrics_recorded = Signal(providing_args=['name', 'metrics'])
+
+logger = logging.getLogger('fullcalendar.instrumentation')
+
+_local = threading.local()
+
+
+def is_enabled():
+    return bool(fullcalendar_settings.FULLCALENDAR_INSTRUMENTATION)
+
+
+def get_sinks():
+    return [
+        import_string(sink) if isinstance(sink, six.string_types) else sink
+        for sink in fullcalendar_settings.FULLCALENDAR_INSTRUMENTATION
+    ]
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def measure(name):
+    """
+    Measure the enclosed block as ``name``. Yields the metrics dictionary,
+    which is completed and sent to the sinks when the block exits.
+    """
+    if not is_enabled():
+        yield {}
+        return
+
+    metrics = {}
+    force_debug_cursor = connection.force_debug_cursor
+    connection.force_debug_cursor = True
+    first_query = len(connection.queries_log)
+    started = time.time()
+
+    _stack().append(metrics)
+    try:
+        yield metrics
+    finally:
+        _stack().pop()
+        connection.force_debug_cursor = force_debug_cursor
+
+        queries = list(connection.queries_log)[first_query:]
+        metrics['time'] = time.time() - started
+        metrics['queries'] = len(queries)
+        metrics['db_time'] = sum(float(query['time']) for query in queries)
+
+        metrics_recorded.send(sender=None, name=name, metrics=metrics)
+        for sink in get_sinks():
+            sink(name, metrics)
+
+
+def record(**values):
+    """
+    Add counters to the innermost measurement, e.g. ``record(rows=10)``.
+    Does nothing outside a measurement.
+    """
+    stack = _stack()
+    if stack:
+        for key, value in values.items():
+            stack[-1][key] = stack[-1].get(key, 0) + value
+
+
+@contextmanager
+def timing(key):
+    """
+    Add the time spent in the enclosed block to ``key`` of the innermost
+    measurement.
+    """
+    started = time.time()
+    try:
+        yield
+    finally:
+        record(**{key: time.time() - started})
+
+
+def instrumented(name):
+    """
+    Decorator measuring every call of a function as ``name``.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class InstrumentedViewMixin(object):
+    """
+        A mixin class measuring the requests of a class based view, named
+        after the view class.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with measure('view.' + self.__class__.__name__):
+            return super(InstrumentedViewMixin, self).dispatch(
+                request, *args, **kwargs)
+
+
+class InstrumentationMiddleware(object):
+    """
+    Measures complete requests, named after the URL pattern name.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not is_enabled():
+            return None
+
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            url_name = None
+
+        request._fullcalendar_measure = measure(
+            'request.' + (url_name or 'unknown'))
+        request._fullcalendar_measure.__enter__()
+
+    def process_response(self, request, response):
+        measurement = getattr(request, '_fullcalendar_measure', None)
+        if measurement is not None:
+            del request._fullcalendar_measure
+            measurement.__exit__(None, None, None)
+
+        return response
+
+
+def log_metrics(name, metrics):
+    """
+    Sink writing every measurement to the ``fullcalendar.instrumentation``
+    logger.
+    """
+    logger.info('%s %s', name, ' '.join(
+        '%s=%s' % (key, round(value, 4) if isinstance(value, float) else value)
+        for key, value in sorted(metrics.items())
+    ))
+
+
+def statsd_metrics(name, metrics):
+    """
+    Sink sending every measurement to the statsd server at
+    ``FULLCALENDAR_STATSD_ADDRESS``: timings in milliseconds, counters as
+    gauges.
+    """
+    prefix = fullcalendar_settings.FULLCALENDAR_STATSD_PREFIX
+    lines = []
+
+    for key, value in sorted(metrics.items()):
+        if isinstance(value, float):
+            lines.append('%s.%s.%s:%d|ms' % (prefix, name, key, value * 1000))
+        else:
+            lines.append('%s.%s.%s:%d|g' % (prefix, name, key, value))
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.sendto('\n'.join(lines).encode('ascii'),
+                    fullcalendar_settings.FULLCALENDAR_STATSD_ADDRESS)
+    except socket.error:
+        logger.exception('Could not send metrics to statsd')
+    finally:
+        sock.close()
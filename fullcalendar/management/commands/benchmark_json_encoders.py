@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+from django.utils import six
+from django.utils.module_loading import import_string
+
+from fullcalendar import encoders
+from fullcalendar.conf import settings as fullcalendar_settings
+
+
+def make_events(count):
+    '''
+    Return ``count`` dictionaries shaped like the events of the calendar
+    feed, for 200 events with colors on every other one.
+    '''
+    start = datetime(2016, 1, 1, 10)
+    events = []
+
+    for i in range(count):
+        event_id = i % 200
+        start_time = start + timedelta(minutes=30 * i)
+        data = {
+            'id': str(event_id),
+            'title': u'Event n\xfamero %d' % event_id,
+            'start': start_time.isoformat() + '+00:00',
+            'end': (start_time + timedelta(hours=2)).isoformat() + '+00:00',
+            'url': '//example.com/events/event/event-numero-%d/%d/' % (
+                event_id, i + 1),
+        }
+        if event_id % 2:
+            data.update({'color': '#336699', 'textColor': '#ffffff'})
+        events.append(data)
+
+    return events
+
+
+def json_response_dumps(data):
+    return JsonResponse(data, safe=False).content
+
+
+class Command(BaseCommand):
+    help = ("Compare the throughput of JSON encoders for the calendar feed: "
+            "JsonResponse, fullcalendar.encoders.fast_dumps, "
+            "FULLCALENDAR_JSON_ENCODER and the given encoders.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'encoders', nargs='*', metavar='encoder',
+            help="Dotted path of another encoder to compare, e.g. "
+                 "ujson.dumps.")
+        parser.add_argument(
+            '--sizes', default='1000,10000,50000',
+            help="Comma separated numbers of events (default "
+                 "1000,10000,50000).")
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help="Number of runs per encoder and size, of which the fastest "
+                 "is reported (default 5).")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes must be comma separated numbers.")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        candidates = [
+            ('JsonResponse', json_response_dumps),
+            ('fullcalendar.encoders.fast_dumps', encoders.fast_dumps),
+        ]
+        configured = fullcalendar_settings.FULLCALENDAR_JSON_ENCODER
+        for path in ([configured] if configured else []) + options['encoders']:
+            try:
+                encoder = import_string(path) \
+                    if isinstance(path, six.string_types) else path
+            except ImportError as e:
+                raise CommandError("Could not import %s: %s" % (path, e))
+            candidates.append((getattr(encoder, '__module__', '') + '.' +
+                               getattr(encoder, '__name__', repr(encoder)),
+                               encoder))
+
+        for size in sizes:
+            events = make_events(size)
+            self.stdout.write("%d events:" % size)
+
+            for name, encoder in candidates:
+                content = encoder(events)
+                if isinstance(content, bytes):
+                    content = content.decode('utf-8')
+                if json.loads(content) != events:
+                    raise CommandError("%s does not round-trip the events."
+                                       % name)
+
+                best = None
+                for i in range(options['repeat']):
+                    started = time.time()
+                    encoder(events)
+                    elapsed = time.time() - started
+                    best = elapsed if best is None else min(best, elapsed)
+
+                best = max(best, 0.000001)
+                self.stdout.write(
+                    "  %-40s %8.1f ms %10d events/s %10d bytes" % (
+                        name, best * 1000, size / best,
+                        len(content.encode('utf-8'))))
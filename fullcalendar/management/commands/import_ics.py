@@ -0,0 +1,402 @@
+from datetime import datetime, time as datetime_time, timedelta
+from itertools import islice
+import re
+import time
+
+from dateutil import rrule
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import six, timezone
+from django.utils.html import strip_tags
+import icalendar
+from mezzanine.utils.sites import current_site_id
+
+from fullcalendar import cache
+from fullcalendar.conf import settings as fullcalendar_settings
+from fullcalendar.models import Event, EventCategory, FeedEntry, \
+    Occurrence, OccurrenceBucket
+
+
+def read_vevents(lines):
+    '''
+    Yield the unparsed ``VEVENT`` components of an iCalendar file one at a
+    time, so the file is never parsed, or held in memory, as a whole.
+
+    Each component is yielded as the lines it was read as joined, see
+    ``from_ical``.
+    '''
+    block = None
+
+    for line in lines:
+        if block is None:
+            if line.strip() in (b'BEGIN:VEVENT', 'BEGIN:VEVENT'):
+                block = [line]
+        else:
+            block.append(line)
+            if line.strip() in (b'END:VEVENT', 'END:VEVENT'):
+                yield line[:0].join(block)
+                block = None
+
+
+def from_ical(block):
+    '''
+    Return the ``icalendar.Event`` of a block yielded by ``read_vevents``.
+    Raises ``ValueError`` if it is not UTF-8 or a property could not be
+    parsed, which ``icalendar`` only records.
+    '''
+    if isinstance(block, bytes):
+        # Unfold before decoding, as folding may split a multi-byte character
+        block = re.sub(b'\r?\n[ \t]', b'', block).decode('utf-8')
+
+    vevent = icalendar.Event.from_ical(block)
+    if vevent.errors:
+        raise ValueError('; '.join('%s: %s' % error for error in vevent.errors))
+
+    return vevent
+
+
+def get_uid(block):
+    '''
+    Return the ``UID`` of a block yielded by ``read_vevents`` without parsing
+    it, to report events that could not be parsed.
+    '''
+    if isinstance(block, bytes):
+        block = block.decode('utf-8', 'replace')
+
+    match = re.search(r'^UID:(.*?)\r?$', block, re.MULTILINE)
+
+    return match.group(1) if match else 'event without UID'
+
+
+def to_datetime(value):
+    '''
+    Return a ``DTSTART``, ``DTEND``, ``RDATE`` or ``EXDATE`` value as an aware
+    datetime. Dates and floating times are taken to be in the default time
+    zone.
+    '''
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime_time.min)
+
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.get_default_timezone())
+
+    return value
+
+
+def to_utc_until(value):
+    '''
+    Return the ``RRULE`` value with a date or floating ``UNTIL`` converted to
+    UTC the way ``to_datetime`` converts the start time, as dateutil wants
+    ``UNTIL`` in UTC when the start time has a time zone.
+    '''
+    match = re.search(r'UNTIL=([0-9]{8})(?:T([0-9]{6}))?(Z?)', value)
+    if match is None or match.group(3):
+        return value
+
+    until = to_datetime(datetime.strptime(
+        match.group(1) + (match.group(2) or '000000'), '%Y%m%d%H%M%S'))
+
+    return value[:match.start()] + until.astimezone(timezone.utc).strftime(
+        'UNTIL=%Y%m%dT%H%M%SZ') + value[match.end():]
+
+
+def get_property(vevent, name):
+    '''
+    Return the values of a property that may occur more than once.
+    '''
+    values = vevent.get(name, [])
+
+    return values if isinstance(values, list) else [values]
+
+
+def to_local_until(value, tz):
+    '''
+    Return the ``RRULE`` value returned by ``to_utc_until`` with ``UNTIL``
+    as a wall-clock time in the time zone ``tz``, to expand the rule from a
+    naive start time.
+    '''
+    match = re.search(r'UNTIL=([0-9]{8}T[0-9]{6})Z', value)
+    if match is None:
+        return value
+
+    until = timezone.make_aware(
+        datetime.strptime(match.group(1), '%Y%m%dT%H%M%S'), timezone.utc)
+
+    return value[:match.start()] + timezone.make_naive(until, tz).strftime(
+        'UNTIL=%Y%m%dT%H%M%S') + value[match.end():]
+
+
+def get_start_times(vevent, start_time, horizon, limit):
+    '''
+    Return the start times of the occurrences of ``vevent`` up to
+    ``horizon``, or to its first occurrence if it starts later, and its
+    ``RRULE`` value. The value is ``None`` if the rule has instances after
+    ``horizon``, which includes all rules without ``COUNT`` or ``UNTIL``, so
+    a stored rule always describes the imported occurrences.
+
+    The rule is expanded in the wall-clock time of the time zone of the
+    start time, so instances keep their local time across daylight saving
+    time changes, as RFC 5545 wants, and match ``EXDATE`` values.
+
+    Raises ``ValueError`` if there are more than ``limit`` occurrences up to
+    ``horizon``.
+    '''
+    rules = get_property(vevent, 'rrule')
+    if not rules:
+        return [start_time], None
+
+    tz = start_time.tzinfo
+    value = to_utc_until(rules[0].to_ical().decode('ascii'))
+    dates = rrule.rruleset()
+    dates.rrule(rrule.rrulestr(to_local_until(value, tz),
+                               dtstart=timezone.make_naive(start_time, tz)))
+
+    for rdate in get_property(vevent, 'rdate'):
+        for item in rdate.dts:
+            dates.rdate(timezone.make_naive(to_datetime(item.dt), tz))
+    for exdate in get_property(vevent, 'exdate'):
+        for item in exdate.dts:
+            dates.exdate(timezone.make_naive(to_datetime(item.dt), tz))
+
+    horizon = timezone.make_naive(max(horizon, start_time), tz)
+    start_times = []
+
+    for dt in dates:
+        if dt > horizon:
+            value = None
+            break
+        if len(start_times) == limit:
+            raise ValueError("more than %d occurrences up to the horizon, "
+                             "see --max-occurrences" % limit)
+        # Instances in a skipped or repeated hour get the standard offset
+        start_times.append(timezone.make_aware(dt, tz, is_dst=False))
+
+    return start_times, value
+
+
+def parse_vevent(vevent, horizon, limit):
+    '''
+    Return the fields of an ``Event`` and the times of its occurrences for
+    ``vevent``, as a dictionary. See ``get_start_times`` for ``horizon`` and
+    ``limit``.
+    '''
+    dtstart = vevent.decoded('dtstart')
+    start_time = to_datetime(dtstart)
+
+    if 'dtend' in vevent:
+        duration = to_datetime(vevent.decoded('dtend')) - start_time
+    elif 'duration' in vevent:
+        duration = vevent.decoded('duration')
+    elif not isinstance(dtstart, datetime):
+        # An all-day event without an end lasts the day, see RFC 5545
+        duration = timedelta(days=1)
+    else:
+        duration = fullcalendar_settings.FULLCALENDAR_OCCURRENCE_DURATION
+
+    start_times, recurrence = get_start_times(vevent, start_time, horizon,
+                                              limit)
+
+    return {
+        'title': six.text_type(vevent.get('summary', '')),
+        'content': six.text_type(vevent.get('description', '')),
+        'location': six.text_type(vevent.get('location', '')) or None,
+        'start_time': start_time,
+        'duration': duration,
+        'start_times': start_times,
+        'recurrence': recurrence,
+    }
+
+
+class SlugRegistry(object):
+    '''
+    Hands out slugs the way ``Slugged.generate_unique_slug`` would, checking
+    against the ``taken`` slugs in memory instead of a query per slug.
+    '''
+
+    def __init__(self, taken):
+        self.taken = set(taken)
+        self.suffixes = {}
+
+    def unique(self, slug):
+        candidate = slug
+        suffix = self.suffixes.get(slug, 1)
+
+        while candidate in self.taken:
+            candidate = '%s-%s' % (slug, suffix)
+            suffix += 1
+
+        self.suffixes[slug] = suffix
+        self.taken.add(candidate)
+
+        return candidate
+
+
+class Command(BaseCommand):
+    help = ("Import the events of an iCalendar (.ics) file into the current "
+            "site. Recurring events get occurrences up to "
+            "FULLCALENDAR_RECURRENCE_HORIZON from now, and are skipped if "
+            "that is more than --max-occurrences. The file is read one "
+            "event at a time and written in batches, each in its own "
+            "transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The .ics file to import.")
+        parser.add_argument(
+            '--category',
+            help="Name of the event category of the imported events.")
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Number of events written per transaction (default 500).")
+        parser.add_argument(
+            '--max-occurrences', type=int, default=10000,
+            help="Skip recurring events with more occurrences up to "
+                 "FULLCALENDAR_RECURRENCE_HORIZON (default 10000).")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Read and expand the events without saving them, and report "
+                 "the throughput.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options['max_occurrences'] < 1:
+            raise CommandError("--max-occurrences must be at least 1.")
+
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.max_occurrences = options['max_occurrences']
+        self.site_id = current_site_id()
+        self.category = None
+        if options['category'] and not self.dry_run:
+            self.category, created = EventCategory.objects.get_or_create(
+                name=options['category'])
+
+        if not self.dry_run:
+            self.event_slugs = SlugRegistry(Event._base_manager.filter(
+                site_id=self.site_id).values_list('slug', flat=True))
+            self.occurrence_slugs = SlugRegistry(
+                Occurrence.objects.values_list('slug', flat=True))
+
+        try:
+            ics = open(options['path'], 'rb')
+        except IOError as e:
+            raise CommandError("Could not open %s: %s" % (options['path'], e))
+
+        horizon = (timezone.now() +
+                   fullcalendar_settings.FULLCALENDAR_RECURRENCE_HORIZON)
+        started = time.time()
+        self.events = self.occurrences = self.skipped = 0
+
+        with ics:
+            records = self.parse(read_vevents(ics), horizon)
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch)
+
+        if not self.dry_run and self.events:
+            cache.invalidate_all()
+
+        elapsed = max(time.time() - started, 0.001)
+        self.stdout.write(
+            "%s %d events with %d occurrences in %.1f s (%d events/s, %d "
+            "occurrences/s), skipped %d events." % (
+                "Read" if self.dry_run else "Imported",
+                self.events, self.occurrences, elapsed,
+                self.events / elapsed, self.occurrences / elapsed,
+                self.skipped
+            )
+        )
+
+    def parse(self, blocks, horizon):
+        for block in blocks:
+            try:
+                record = parse_vevent(from_ical(block), horizon,
+                                      self.max_occurrences)
+            except (KeyError, TypeError, ValueError) as e:
+                self.stderr.write("Skipped %s: %s" % (get_uid(block), e))
+                self.skipped += 1
+                continue
+
+            if not record['title'] or not record['start_times']:
+                self.skipped += 1
+                continue
+
+            yield record
+
+    def import_batch(self, records):
+        self.events += len(records)
+        self.occurrences += sum(len(record['start_times'])
+                                for record in records)
+
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            self.save_batch(records)
+
+    def save_batch(self, records):
+        '''
+        Insert the events of ``records`` and their occurrences with
+        ``bulk_create``, filling in the fields ``Event.save`` and
+        ``Occurrence.save`` would set.
+        '''
+        now = timezone.now()
+        events = []
+
+        for record in records:
+            event = Event(
+                title=record['title'],
+                content=record['content'],
+                event_category=self.category,
+                site_id=self.site_id,
+                publish_date=now,
+                created=now,
+                updated=now,
+            )
+            event.slug = self.event_slugs.unique(event.get_slug())
+            if event.gen_description:
+                event.description = strip_tags(event.description_from_content())
+            if record['recurrence']:
+                event.recurrence = record['recurrence']
+                event.recurrence_start = record['start_time']
+                event.recurrence_end = record['start_time'] + \
+                    record['duration']
+            events.append(event)
+
+        Event.objects.bulk_create(events)
+
+        # bulk_create does not set the ids on every database
+        ids = dict(Event._base_manager.filter(
+            site_id=self.site_id, created=now
+        ).values_list('slug', 'id'))
+
+        occurrences = []
+        for event, record in zip(events, records):
+            slug = Occurrence(title=event.title).get_slug()
+            occurrences.extend(
+                Occurrence(
+                    event_id=ids[event.slug],
+                    start_time=start_time,
+                    end_time=start_time + record['duration'],
+                    location=record['location'],
+                    title=event.title,
+                    slug=self.occurrence_slugs.unique(slug),
+                    status=event.status,
+                    publish_date=event.publish_date,
+                    expiry_date=event.expiry_date,
+                    gen_description=False,
+                    site_id=self.site_id,
+                    created=now,
+                    updated=now,
+                )
+                for start_time in record['start_times']
+            )
+
+        Occurrence.objects.bulk_create(occurrences,
+                                       batch_size=self.batch_size)
+
+        created = Occurrence.objects.filter(created=now)
+        OccurrenceBucket.objects.rebuild(created)
+        FeedEntry.objects.rebuild(created)
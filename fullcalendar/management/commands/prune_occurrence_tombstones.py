@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from fullcalendar.models import OccurrenceTombstone
+
+
+class Command(BaseCommand):
+    help = ("Delete the records of deleted occurrences that are older than "
+            "FULLCALENDAR_SYNC_RETENTION.")
+
+    def handle(self, *args, **options):
+        count = OccurrenceTombstone.objects.prune()
+
+        self.stdout.write("Deleted %d occurrence tombstones." % count)
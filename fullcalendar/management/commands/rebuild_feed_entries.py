@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fullcalendar.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = ("Recreate the feed entries read by the calendar feed. Run after "
+            "enabling FULLCALENDAR_FEED_TABLE or changing the calendar URLs.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = FeedEntry.objects.rebuild()
+
+        self.stdout.write("Rebuilt feed entries for %d occurrences." % count)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fullcalendar.models import OccurrenceBucket
+
+
+class Command(BaseCommand):
+    help = ("Recreate the occurrence buckets used for calendar range "
+            "lookups. Run after enabling FULLCALENDAR_OCCURRENCE_BUCKETS "
+            "or changing its value.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = OccurrenceBucket.objects.rebuild()
+
+        self.stdout.write("Rebuilt buckets for %d occurrences." % count)
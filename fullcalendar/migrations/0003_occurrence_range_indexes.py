@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_auto_20160220_1509'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='occurrence',
+            index_together=set([('site', 'status', 'start_time'), ('status', 'end_time', 'start_time')]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_occurrence_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccurrenceBucket',
+            fields=[
+                ('id', models.AutoField(serialize=False, auto_created=True, primary_key=True, verbose_name='ID')),
+                ('bucket', models.IntegerField(verbose_name='bucket')),
+                ('occurrence', models.ForeignKey(editable=False, related_name='buckets', to='events.Occurrence')),
+            ],
+            options={
+                'verbose_name_plural': 'occurrence buckets',
+                'verbose_name': 'occurrence bucket',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='occurrencebucket',
+            unique_together=set([('bucket', 'occurrence')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_occurrencebucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='recurrence',
+            field=models.TextField(blank=True, editable=False, verbose_name='recurrence rule'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_start',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='recurrence start'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_end',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='recurrence end'),
+        ),
+    ]
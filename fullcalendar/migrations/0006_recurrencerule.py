@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurrenceRule',
+            fields=[
+                ('id', models.AutoField(serialize=False, auto_created=True, primary_key=True, verbose_name='ID')),
+                ('rule', models.TextField(help_text='RRULE value as described in RFC 5545, e.g. "FREQ=WEEKLY;BYDAY=MO,TH". UNTIL must be in UTC.', verbose_name='rule')),
+                ('start_time', models.DateTimeField(verbose_name='start time')),
+                ('end_time', models.DateTimeField(verbose_name='end time')),
+                ('updated', models.DateTimeField(editable=False, null=True)),
+                ('event', models.ForeignKey(related_name='recurrence_rules', verbose_name='event', to='events.Event')),
+            ],
+            options={
+                'verbose_name_plural': 'recurrence rules',
+                'verbose_name': 'recurrence rule',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.CreateModel(
+            name='RecurrenceException',
+            fields=[
+                ('id', models.AutoField(serialize=False, auto_created=True, primary_key=True, verbose_name='ID')),
+                ('start_time', models.DateTimeField(verbose_name='start time')),
+                ('rule', models.ForeignKey(related_name='exceptions', verbose_name='rule', to='events.RecurrenceRule')),
+            ],
+            options={
+                'verbose_name_plural': 'recurrence exceptions',
+                'verbose_name': 'recurrence exception',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recurrenceexception',
+            unique_together=set([('rule', 'start_time')]),
+        ),
+    ]
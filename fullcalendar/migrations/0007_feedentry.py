@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0001_initial'),
+        ('events', '0006_recurrencerule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('occurrence', models.OneToOneField(editable=False, related_name='feed_entry', serialize=False, primary_key=True, to='events.Occurrence')),
+                ('status', models.IntegerField(verbose_name='status')),
+                ('publish_date', models.DateTimeField(null=True, verbose_name='published from')),
+                ('expiry_date', models.DateTimeField(null=True, verbose_name='expires on')),
+                ('start_time', models.DateTimeField(verbose_name='start time')),
+                ('end_time', models.DateTimeField(verbose_name='end time')),
+                ('title', models.CharField(max_length=500, verbose_name='title')),
+                ('start', models.CharField(max_length=32, verbose_name='start')),
+                ('end', models.CharField(max_length=32, verbose_name='end')),
+                ('url', models.CharField(max_length=2000, verbose_name='url')),
+                ('color', models.CharField(max_length=10, blank=True, verbose_name='color')),
+                ('event', models.ForeignKey(editable=False, related_name='+', to='events.Event')),
+                ('site', models.ForeignKey(editable=False, related_name='+', to='sites.Site')),
+            ],
+            options={
+                'ordering': ('start_time', 'end_time'),
+                'verbose_name_plural': 'feed entries',
+                'verbose_name': 'feed entry',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterIndexTogether(
+            name='feedentry',
+            index_together=set([('site', 'status', 'start_time'), ('status', 'end_time', 'start_time')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0001_initial'),
+        ('events', '0007_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccurrenceTombstone',
+            fields=[
+                ('id', models.AutoField(serialize=False, auto_created=True, primary_key=True, verbose_name='ID')),
+                ('occurrence_id', models.IntegerField(verbose_name='occurrence id')),
+                ('deleted', models.DateTimeField(db_index=True, verbose_name='deleted')),
+                ('site', models.ForeignKey(editable=False, related_name='+', to='sites.Site')),
+            ],
+            options={
+                'verbose_name_plural': 'occurrence tombstones',
+                'verbose_name': 'occurrence tombstone',
+            },
+            bases=(models.Model,),
+        ),
+    ]
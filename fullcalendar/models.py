@@ -1,24 +1,66 @@
 from datetime import datetime
+from itertools import count, islice
+import re
 
 from dateutil import rrule
 from django.utils.translation import ugettext_lazy as _
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils import timezone
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Concat
 from mezzanine.core.models import Displayable, RichText, SiteRelated
 from mezzanine.core.managers import SearchableManager
 from mezzanine.core.managers import PublishedManager
 from mezzanine.core.managers import CurrentSiteManager
+from mezzanine.utils.sites import current_site_id
 
 
 __all__ = (
     'EventCategory',
     'Event',
     'Occurrence',
+    'OccurrenceBucket',
+    'FeedEntry',
+    'OccurrenceTombstone',
+    'RecurrenceRule',
+    'RecurrenceException',
     'create_event'
 )
 
 
+# Monday, so week buckets line up with calendar weeks.
+BUCKET_EPOCH = datetime(1969, 12, 29)
+
+BUCKET_DAYS = {
+    'day': 1,
+    'week': 7,
+}
+
+
+def bucket_range(start, end):
+    '''
+    Return the ``(first, last)`` bucket keys covered by the given datetime
+    range, or ``None`` if occurrence buckets are disabled.
+
+    Buckets are consecutive blocks of whole days counted from
+    ``BUCKET_EPOCH``; the size of a block is set by
+    ``FULLCALENDAR_OCCURRENCE_BUCKETS``.
+    '''
+    from fullcalendar.conf import settings as fullcalendar_settings
+
+    size = fullcalendar_settings.FULLCALENDAR_OCCURRENCE_BUCKETS
+    if not size:
+        return None
+
+    days = BUCKET_DAYS[size]
+    epoch = BUCKET_EPOCH
+    if timezone.is_aware(start):
+        epoch = timezone.make_aware(epoch, timezone.utc)
+
+    return ((start - epoch).days // days, (end - epoch).days // days)
+
+
 @python_2_unicode_compatible
 class EventCategory(SiteRelated):
     '''
@@ -47,17 +89,74 @@ class Event(Displayable, RichText):
         EventCategory,
         verbose_name=_('event category'), blank=True, null=True
     )
+    recurrence = models.TextField(_('recurrence rule'), blank=True,
+                                  editable=False)
+    recurrence_start = models.DateTimeField(
+        _('recurrence start'), blank=True, null=True, editable=False)
+    recurrence_end = models.DateTimeField(
+        _('recurrence end'), blank=True, null=True, editable=False)
 
     class Meta:
         verbose_name = _('event')
         verbose_name_plural = _('events')
         ordering = ('-publish_date',)
 
+    # Fields copied to every ``Occurrence`` of the event
+    occurrence_fields = ('title', 'status', 'publish_date', 'expiry_date')
+    # Other fields the feed entries of the occurrences are rendered from
+    feed_fields = ('slug', 'event_category_id', 'site_id')
+
     def save(self, *args, **kwargs):
+        from fullcalendar.conf import settings as fullcalendar_settings
+
+        old = None
+        if self.pk is not None:
+            # Not Event.objects, which only sees the current site
+            old = Event._base_manager.filter(pk=self.pk).values(
+                *self.occurrence_fields + self.feed_fields).first()
+
         super(Event, self).save(*args, **kwargs)
-        my_occurrences = Occurrence.objects.filter(event__id=self.id)
-        for occurrence in my_occurrences:
-            occurrence.save()
+
+        if old is None:
+            return
+
+        if any(old[field] != getattr(self, field)
+               for field in self.occurrence_fields):
+            # Rebuilds the feed entries too
+            self.update_occurrences()
+        elif fullcalendar_settings.FULLCALENDAR_FEED_TABLE and any(
+                old[field] != getattr(self, field)
+                for field in self.feed_fields):
+            FeedEntry.objects.rebuild(Occurrence.objects.filter(event=self))
+
+    def update_occurrences(self):
+        '''
+        Copy the title, status and publish and expiry dates to all
+        occurrences with set-based updates, as ``Occurrence.save`` would.
+        As the updates send no signals, the feed entries of the occurrences
+        and the calendar cache are updated explicitly.
+        '''
+        from fullcalendar import cache
+        from fullcalendar.conf import settings as fullcalendar_settings
+
+        occurrences = Occurrence.objects.filter(event=self)
+        occurrences.update(
+            status=self.status,
+            publish_date=self.publish_date,
+            expiry_date=self.expiry_date,
+            updated=timezone.now()
+        )
+        occurrences.filter(description='').update(title=self.title)
+        occurrences.exclude(description='').update(title=Concat(
+            models.Value(self.title + ' ('),
+            'description',
+            models.Value(')'),
+            output_field=models.CharField()
+        ))
+
+        if fullcalendar_settings.FULLCALENDAR_FEED_TABLE:
+            FeedEntry.objects.rebuild(occurrences)
+        cache.invalidate_all()
 
     @models.permalink
     def get_absolute_url(self):
@@ -82,16 +181,141 @@ class Event(Displayable, RichText):
         If both ``count`` and ``until`` entries are missing from ``rrule_params``,
         only a single ``Occurrence`` instance will be created using the exact
         ``start_time`` and ``end_time`` values.
+
+        Recurring occurrences are inserted with ``bulk_create`` in batches of
+        ``FULLCALENDAR_OCCURRENCE_BATCH_SIZE``, see ``bulk_add_occurrences``.
+        Set it to ``0`` to save every occurrence separately instead.
+
+        The first recurrence rule added to an event is stored on the event,
+        see ``set_recurrence``.
         '''
+        from fullcalendar.conf import settings as fullcalendar_settings
+
         rrule_params.setdefault('freq', rrule.DAILY)
 
         if 'count' not in rrule_params and 'until' not in rrule_params:
             self.occurrence_set.create(start_time=start_time, end_time=end_time)
+            return
+
+        if not self.recurrence:
+            self.set_recurrence(start_time, end_time, **rrule_params)
+
+        if fullcalendar_settings.FULLCALENDAR_OCCURRENCE_BATCH_SIZE:
+            self.bulk_add_occurrences(
+                start_time, end_time,
+                fullcalendar_settings.FULLCALENDAR_OCCURRENCE_BATCH_SIZE,
+                **rrule_params
+            )
         else:
             delta = end_time - start_time
             for ev in rrule.rrule(dtstart=start_time, **rrule_params):
                 self.occurrence_set.create(start_time=ev, end_time=ev + delta)
 
+    def set_recurrence(self, start_time, end_time, **rrule_params):
+        '''
+        Store the recurrence rule, as an RFC 5545 ``RRULE`` value, and the
+        times of its first occurrence, so the iCalendar export can describe
+        the series with a single ``VEVENT``.
+        '''
+        rule = rrule.rrule(dtstart=start_time, **rrule_params)
+        value = str(rule).split('RRULE:', 1)[1]
+
+        # dateutil leaves UNTIL in local time, RFC 5545 wants UTC when the
+        # start time has a time zone.
+        until = rrule_params.get('until')
+        if isinstance(until, datetime) and timezone.is_aware(until):
+            value = re.sub(
+                r'UNTIL=[^;]*',
+                until.astimezone(timezone.utc).strftime('UNTIL=%Y%m%dT%H%M%SZ'),
+                value
+            )
+
+        self.recurrence = value
+        self.recurrence_start = start_time.replace(microsecond=0)
+        self.recurrence_end = end_time.replace(microsecond=0)
+        Event._base_manager.filter(pk=self.pk).update(
+            recurrence=self.recurrence,
+            recurrence_start=self.recurrence_start,
+            recurrence_end=self.recurrence_end
+        )
+
+    def get_recurrence_rule(self):
+        '''
+        Return the stored recurrence rule as a ``dateutil.rrule.rrule``, or
+        ``None`` if the event has none. A rule without ``COUNT`` or ``UNTIL``,
+        which ``add_occurrences`` never stores, is ignored as well, as its
+        instances would only end in the year 9999.
+        '''
+        if not self.recurrence or ('COUNT=' not in self.recurrence and
+                                   'UNTIL=' not in self.recurrence):
+            return None
+
+        return rrule.rrulestr(self.recurrence, dtstart=self.recurrence_start)
+
+    def bulk_add_occurrences(self, start_time, end_time, batch_size,
+                             **rrule_params):
+        '''
+        Add the occurrences of ``rrule_params`` using ``bulk_create``, in
+        batches of ``batch_size``.
+
+        Fills in the fields ``Occurrence.save`` and its Mezzanine base classes
+        would set (title, status, publish and expiry dates, site, slug and
+        timestamps) in memory. As ``post_save`` is not sent, occurrence
+        buckets, feed entries and the calendar cache are updated explicitly.
+        '''
+        from fullcalendar import cache
+
+        delta = end_time - start_time
+        now = timezone.now()
+        site_id = current_site_id()
+        slugs = self._unique_occurrence_slugs()
+
+        occurrences = (
+            Occurrence(
+                event=self,
+                start_time=ev,
+                end_time=ev + delta,
+                title=self.title,
+                slug=next(slugs),
+                status=self.status,
+                publish_date=self.publish_date,
+                expiry_date=self.expiry_date,
+                gen_description=False,
+                site_id=site_id,
+                created=now,
+                updated=now,
+            )
+            for ev in rrule.rrule(dtstart=start_time, **rrule_params)
+        )
+
+        while True:
+            batch = list(islice(occurrences, batch_size))
+            if not batch:
+                break
+            Occurrence.objects.bulk_create(batch)
+
+        OccurrenceBucket.objects.rebuild(
+            self.occurrence_set.filter(created=now))
+        FeedEntry.objects.rebuild(self.occurrence_set.filter(created=now))
+        cache.invalidate_all()
+
+    def _unique_occurrence_slugs(self):
+        '''
+        Generate the slugs ``Slugged.generate_unique_slug`` would give new
+        occurrences titled after this event, checking for existing slugs
+        with a single query.
+        '''
+        slug = Occurrence(title=self.title).get_slug()
+        taken = set(Occurrence.objects.filter(
+            slug__startswith=slug).values_list('slug', flat=True))
+
+        if slug not in taken:
+            yield slug
+        for i in count(1):
+            candidate = '%s-%s' % (slug, i)
+            if candidate not in taken:
+                yield candidate
+
     def upcoming_occurrences(self):
         '''
         Return all occurrences that are set to start on or after the current
@@ -128,6 +352,17 @@ class OccurrenceManager(PublishedManager, SearchableManager):
 
         return qs.select_related('event')
 
+    def for_display(self, for_user=None):
+        '''
+        Returns the published occurrences, joined with everything that is
+        needed to display them: the event, the site of the occurrence and of
+        the event, and the event category. Views and template tags listing
+        occurrences should start from this queryset, so they run the same
+        number of queries no matter how many occurrences they show.
+        '''
+        return self.published(for_user=for_user).select_related(
+            'site', 'event__site', 'event__event_category')
+
     def upcoming(self, start=None, end=None, for_user=None):
         """
         Returns a queryset containing the upcoming occurences no matter what
@@ -141,13 +376,25 @@ class OccurrenceManager(PublishedManager, SearchableManager):
 
         start = start or timezone.now()
 
-        qs = self.published(for_user=for_user).filter(start_time__gte=start)
+        qs = self.for_display(for_user=for_user).filter(start_time__gte=start)
 
         if end:
             qs.filter(start_time__lte=end)
 
         return qs
 
+    def upcoming_for_sites(self, site_ids, start=None, end=None,
+                           for_user=None):
+        '''
+        Returns a queryset containing the upcoming occurrences of the sites
+        with the given ids, see ``upcoming``.
+
+        The sites are matched on the occurrence's own site, which is also the
+        first column of its (site, status, start_time) index.
+        '''
+        return self.upcoming(start=start, end=end, for_user=for_user).filter(
+            site__id__in=site_ids)
+
     def daily_occurrences(self, dt=None, event=None):
         '''
         Returns a queryset of for instances that have any overlap with a
@@ -163,6 +410,7 @@ class OccurrenceManager(PublishedManager, SearchableManager):
         start = timezone.make_aware(start, timezone.utc)
         end = start.replace(hour=23, minute=59, second=59)
         qs = self.published().filter(
+            OccurrenceBucket.objects.lookup(start, end),
             models.Q(
                 start_time__gte=start,
                 start_time__lte=end,
@@ -179,11 +427,43 @@ class OccurrenceManager(PublishedManager, SearchableManager):
 
         return qs.filter(event=event) if event else qs
 
+    def get_recurrence_rules(self, for_user=None):
+        '''
+        Returns the ``RecurrenceRule`` objects whose generated occurrences
+        belong with the occurrences of this manager.
+        '''
+        return RecurrenceRule.objects.published(for_user=for_user)
+
+    def upcoming_with_recurrences(self, start=None, for_user=None,
+                                  site_ids=None):
+        '''
+        Returns the upcoming occurrences, both stored ones and those
+        generated from recurrence rules, as a lazy ``Upcoming`` sequence,
+        see ``fullcalendar.recurrence``. With ``site_ids``, only those of
+        the sites with the given ids, see ``upcoming_for_sites``.
+        '''
+        from fullcalendar import recurrence
+
+        start = start or timezone.now()
+        rules = self.get_recurrence_rules(for_user=for_user)
+
+        if site_ids is None:
+            qs = self.upcoming(start=start, for_user=for_user)
+        else:
+            qs = self.upcoming_for_sites(site_ids, start=start,
+                                         for_user=for_user)
+            rules = rules.filter(event__site__id__in=site_ids)
+
+        return recurrence.Upcoming(qs, rules, start)
+
 
 class SiteRelatedOccurrenceManager(CurrentSiteManager, OccurrenceManager):
-    def get_queryset(self):
-        # the intersection of the query sets of both managers
-        return CurrentSiteManager.get_queryset(self) & OccurrenceManager.get_queryset(self)
+    # CurrentSiteManager.get_queryset filters the queryset of the next
+    # manager in the MRO, which is OccurrenceManager.get_queryset
+
+    def get_recurrence_rules(self, for_user=None):
+        return RecurrenceRule.objects.published(for_user=for_user).filter(
+            event__site__id=current_site_id())
 
 
 @python_2_unicode_compatible
@@ -204,12 +484,27 @@ class Occurrence(Displayable):
         verbose_name = _('occurrence')
         verbose_name_plural = _('occurrences')
         ordering = ('start_time', 'end_time')
+        # Composite indexes matching the calendar query shapes: upcoming
+        # occurrences of a single site, and the date range overlap filter
+        # (end_time >= start AND start_time <= end) of the calendar feed.
+        index_together = (
+            ('site', 'status', 'start_time'),
+            ('status', 'end_time', 'start_time'),
+        )
 
     def __str__(self):
         return '%s: %s' % (self.title, self.start_time.strftime('%Y-%m-%d - %H:%M'))
 
     @models.permalink
     def get_absolute_url(self):
+        rule = getattr(self, 'recurrence_rule', None)
+        if self.id is None and rule is not None:
+            # Generated from a recurrence rule, not stored
+            return ('fullcalendar-recurrence', [
+                self.event.slug,
+                str(rule.id),
+                rule.format_instance(self.start_time)
+            ])
         return ('fullcalendar-occurrence', [self.event.slug, str(self.id)])
 
     def __lt__(self, other):
@@ -233,6 +528,423 @@ class Occurrence(Displayable):
         self.publish_date = self.event.publish_date
         self.expiry_date = self.event.expiry_date
         super(Occurrence, self).save(*args, **kwargs)
+        OccurrenceBucket.objects.update_occurrence(self)
+
+
+class OccurrenceBucketManager(models.Manager):
+
+    def lookup(self, start, end):
+        '''
+        Returns a ``Q`` object restricting occurrences to those having a
+        bucket between ``start`` and ``end``, or an empty ``Q`` object if
+        occurrence buckets are disabled.
+        '''
+        buckets = bucket_range(start, end)
+        if buckets is None:
+            return models.Q()
+
+        return models.Q(pk__in=self.filter(
+            bucket__gte=buckets[0],
+            bucket__lte=buckets[1]
+        ).values('occurrence_id'))
+
+    def update_occurrence(self, occurrence):
+        '''
+        Make the stored buckets of ``occurrence`` match its start and end
+        time. Does nothing if occurrence buckets are disabled.
+        '''
+        buckets = bucket_range(occurrence.start_time, occurrence.end_time)
+        if buckets is None:
+            return
+
+        wanted = set(range(buckets[0], buckets[1] + 1))
+        existing = set(self.filter(occurrence=occurrence).values_list(
+            'bucket', flat=True))
+
+        if existing - wanted:
+            self.filter(occurrence=occurrence,
+                        bucket__in=existing - wanted).delete()
+        self.bulk_create([
+            self.model(occurrence=occurrence, bucket=bucket)
+            for bucket in sorted(wanted - existing)
+        ])
+
+    def rebuild(self, occurrences=None):
+        '''
+        Recreate the buckets of ``occurrences``, or of all occurrences if not
+        given, e.g. after enabling occurrence buckets or changing their size.
+        Returns the number of occurrences processed.
+        '''
+        from fullcalendar.conf import settings as fullcalendar_settings
+
+        if occurrences is None:
+            self.all().delete()
+            occurrences = Occurrence.objects.all()
+        else:
+            self.filter(occurrence__in=occurrences).delete()
+
+        if not fullcalendar_settings.FULLCALENDAR_OCCURRENCE_BUCKETS:
+            return 0
+
+        processed = 0
+        buckets = []
+        occurrences = occurrences.order_by().values_list(
+            'id', 'start_time', 'end_time')
+        for pk, start_time, end_time in occurrences.iterator():
+            first, last = bucket_range(start_time, end_time)
+            buckets.extend(
+                self.model(occurrence_id=pk, bucket=bucket)
+                for bucket in range(first, last + 1)
+            )
+            if len(buckets) >= 1000:
+                self.bulk_create(buckets)
+                buckets = []
+            processed += 1
+        self.bulk_create(buckets)
+
+        return processed
+
+
+class OccurrenceBucket(models.Model):
+    '''
+    Day or week bucket overlapped by an ``Occurrence``, maintained when
+    ``FULLCALENDAR_OCCURRENCE_BUCKETS`` is set. Turns the range overlap
+    filter of the calendar views into an indexed lookup on bucket keys.
+    '''
+    occurrence = models.ForeignKey(Occurrence, related_name='buckets',
+                                   editable=False)
+    bucket = models.IntegerField(_('bucket'))
+
+    objects = OccurrenceBucketManager()
+
+    class Meta:
+        verbose_name = _('occurrence bucket')
+        verbose_name_plural = _('occurrence buckets')
+        unique_together = (('bucket', 'occurrence'),)
+
+
+class FeedEntryManager(PublishedManager):
+
+    def rebuild(self, occurrences=None):
+        '''
+        Recreate the feed entries of ``occurrences``, or of all occurrences
+        if not given, e.g. after enabling the feed table. Occurrences are
+        read and entries written in chunks of 500. Returns the number of
+        occurrences processed.
+        '''
+        from fullcalendar.conf import settings as fullcalendar_settings
+        from fullcalendar.formats import format_datetimes
+
+        if occurrences is None:
+            self.all().delete()
+            occurrences = Occurrence.objects.all()
+        else:
+            self.filter(occurrence__in=occurrences).delete()
+
+        if not fullcalendar_settings.FULLCALENDAR_FEED_TABLE:
+            return 0
+
+        processed = 0
+        occurrences = occurrences.order_by().select_related(
+            'event__site', 'event__event_category').iterator()
+        while True:
+            chunk = list(islice(occurrences, 500))
+            if not chunk:
+                break
+            starts = format_datetimes(
+                [occurrence.start_time for occurrence in chunk])
+            ends = format_datetimes(
+                [occurrence.end_time for occurrence in chunk])
+
+            self.bulk_create([
+                self.model(
+                    occurrence=occurrence,
+                    event_id=occurrence.event_id,
+                    site_id=occurrence.site_id,
+                    status=occurrence.status,
+                    publish_date=occurrence.publish_date,
+                    expiry_date=occurrence.expiry_date,
+                    start_time=occurrence.start_time,
+                    end_time=occurrence.end_time,
+                    title=occurrence.title,
+                    start=start,
+                    end=end,
+                    url="//" + occurrence.event.site.domain +
+                        occurrence.get_absolute_url(),
+                    color=(occurrence.event.event_category and
+                           occurrence.event.event_category.color or ''),
+                )
+                for occurrence, start, end in zip(chunk, starts, ends)
+            ])
+            processed += len(chunk)
+
+        return processed
+
+
+class FeedEntry(models.Model):
+    '''
+    Flat copy of an ``Occurrence`` with the values of the calendar feed
+    already rendered, maintained when ``FULLCALENDAR_FEED_TABLE`` is set. The
+    calendar feed reads these rows without joining the event, its site and
+    category.
+    '''
+    occurrence = models.OneToOneField(Occurrence, primary_key=True,
+                                      related_name='feed_entry',
+                                      editable=False)
+    event = models.ForeignKey(Event, related_name='+', editable=False)
+    site = models.ForeignKey('sites.Site', related_name='+', editable=False)
+    status = models.IntegerField(_('status'))
+    publish_date = models.DateTimeField(_('published from'), null=True)
+    expiry_date = models.DateTimeField(_('expires on'), null=True)
+    start_time = models.DateTimeField(_('start time'))
+    end_time = models.DateTimeField(_('end time'))
+    title = models.CharField(_('title'), max_length=500)
+    start = models.CharField(_('start'), max_length=32)
+    end = models.CharField(_('end'), max_length=32)
+    url = models.CharField(_('url'), max_length=2000)
+    color = models.CharField(_('color'), max_length=10, blank=True)
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = _('feed entry')
+        verbose_name_plural = _('feed entries')
+        ordering = ('start_time', 'end_time')
+        # The same query shapes as the Occurrence indexes
+        index_together = (
+            ('site', 'status', 'start_time'),
+            ('status', 'end_time', 'start_time'),
+        )
+
+
+class OccurrenceTombstoneManager(models.Manager):
+
+    def prune(self):
+        '''
+        Delete the tombstones older than ``FULLCALENDAR_SYNC_RETENTION``.
+        Returns the number of tombstones deleted.
+        '''
+        from fullcalendar.conf import settings as fullcalendar_settings
+
+        retention = fullcalendar_settings.FULLCALENDAR_SYNC_RETENTION
+        if not retention:
+            return 0
+
+        old = self.filter(deleted__lt=timezone.now() - retention)
+        count = old.count()
+        old.delete()
+
+        return count
+
+
+class OccurrenceTombstone(models.Model):
+    '''
+    Records the deletion of an ``Occurrence`` for the sync endpoint, when
+    ``FULLCALENDAR_SYNC_RETENTION`` is set.
+    '''
+    occurrence_id = models.IntegerField(_('occurrence id'))
+    site = models.ForeignKey('sites.Site', related_name='+', editable=False)
+    deleted = models.DateTimeField(_('deleted'), db_index=True)
+
+    objects = OccurrenceTombstoneManager()
+
+    class Meta:
+        verbose_name = _('occurrence tombstone')
+        verbose_name_plural = _('occurrence tombstones')
+
+
+class RecurrenceRuleManager(models.Manager):
+
+    def published(self, for_user=None):
+        '''
+        Returns the rules of published events, see
+        ``PublishedManager.published``.
+        '''
+        from mezzanine.core.models import CONTENT_STATUS_PUBLISHED
+
+        qs = self.select_related(
+            'event__site', 'event__event_category'
+        ).prefetch_related('exceptions')
+
+        if for_user is not None and for_user.is_staff:
+            return qs
+
+        now = timezone.now()
+        return qs.filter(
+            models.Q(event__publish_date__lte=now) |
+            models.Q(event__publish_date__isnull=True),
+            models.Q(event__expiry_date__gte=now) |
+            models.Q(event__expiry_date__isnull=True),
+            event__status=CONTENT_STATUS_PUBLISHED
+        )
+
+
+@python_2_unicode_compatible
+class RecurrenceRule(models.Model):
+    '''
+    Recurrence of an ``Event`` whose occurrences are not stored, but
+    generated for the requested period, see ``fullcalendar.recurrence``.
+    Unlike the rules passed to ``Event.add_occurrences``, these may be
+    open-ended.
+
+    Cancelled instances are stored as ``RecurrenceException``; use
+    ``materialize`` to turn an instance into a regular ``Occurrence`` that
+    can be changed.
+    '''
+    event = models.ForeignKey(Event, verbose_name=_('event'),
+                              related_name='recurrence_rules')
+    rule = models.TextField(
+        _('rule'),
+        help_text=_('RRULE value as described in RFC 5545, e.g. '
+                    '"FREQ=WEEKLY;BYDAY=MO,TH". UNTIL must be in UTC.')
+    )
+    start_time = models.DateTimeField(_('start time'))
+    end_time = models.DateTimeField(_('end time'))
+    updated = models.DateTimeField(editable=False, null=True)
+
+    objects = RecurrenceRuleManager()
+
+    class Meta:
+        verbose_name = _('recurrence rule')
+        verbose_name_plural = _('recurrence rules')
+
+    def __str__(self):
+        return '%s: %s' % (self.event, self.rule)
+
+    def clean(self):
+        try:
+            self.get_rule()
+        except (ValueError, TypeError) as e:
+            raise ValidationError({'rule': str(e)})
+
+    def save(self, *args, **kwargs):
+        self.updated = timezone.now()
+        super(RecurrenceRule, self).save(*args, **kwargs)
+
+    def get_rule(self):
+        return rrule.rrulestr(self.rule, dtstart=self.start_time)
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def get_excluded(self):
+        return set(exception.start_time for exception in self.exceptions.all())
+
+    def between(self, start, end):
+        '''
+        Returns the start times of the instances overlapping the period from
+        ``start`` to ``end``, leaving out exceptions.
+        '''
+        excluded = self.get_excluded()
+
+        return [
+            start_time for start_time in
+            self.get_rule().between(start - self.duration, end, inc=True)
+            if start_time not in excluded
+        ]
+
+    def after(self, start, count):
+        '''
+        Returns the start times of at most ``count`` instances starting on or
+        after ``start``, leaving out exceptions.
+        '''
+        excluded = self.get_excluded()
+        start_times = self.get_rule().xafter(
+            start, count=count + len(excluded), inc=True)
+
+        return [
+            start_time for start_time in start_times
+            if start_time not in excluded
+        ][:count]
+
+    def is_instance(self, start_time):
+        return (start_time not in self.get_excluded() and
+                bool(self.get_rule().between(start_time, start_time,
+                                             inc=True)))
+
+    def format_instance(self, start_time):
+        '''
+        Returns the URL representation of an instance start time.
+        '''
+        if timezone.is_aware(start_time):
+            return start_time.astimezone(timezone.utc).strftime(
+                '%Y%m%dT%H%M%SZ')
+        return start_time.strftime('%Y%m%dT%H%M%S')
+
+    def parse_instance(self, value):
+        '''
+        Inverse of ``format_instance``, raises ``ValueError`` for invalid
+        values.
+        '''
+        start_time = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+        if value.endswith('Z'):
+            start_time = timezone.make_aware(start_time, timezone.utc)
+        return start_time
+
+    def occurrence(self, start_time):
+        '''
+        Returns an unsaved ``Occurrence`` for the instance at ``start_time``,
+        with the fields ``Occurrence.save`` would copy from the event.
+        '''
+        event = self.event
+        occurrence = Occurrence(
+            event=event,
+            start_time=start_time,
+            end_time=start_time + self.duration,
+            title=event.title,
+            status=event.status,
+            publish_date=event.publish_date,
+            expiry_date=event.expiry_date,
+            site=event.site
+        )
+        occurrence.recurrence_rule = self
+
+        return occurrence
+
+    def materialize(self, start_time):
+        '''
+        Store the instance at ``start_time`` as a regular ``Occurrence`` and
+        exclude it from the rule, so it can be changed on its own. Returns
+        the new occurrence.
+        '''
+        occurrence = self.occurrence(start_time)
+        occurrence.save()
+        self.exceptions.create(start_time=start_time)
+
+        return occurrence
+
+
+@python_2_unicode_compatible
+class RecurrenceException(models.Model):
+    '''
+    Instance of a ``RecurrenceRule`` that was cancelled or replaced by a
+    stored ``Occurrence``.
+    '''
+    rule = models.ForeignKey(RecurrenceRule, verbose_name=_('rule'),
+                             related_name='exceptions')
+    start_time = models.DateTimeField(_('start time'))
+
+    class Meta:
+        verbose_name = _('recurrence exception')
+        verbose_name_plural = _('recurrence exceptions')
+        unique_together = (('rule', 'start_time'),)
+
+    def __str__(self):
+        return '%s: %s' % (self.rule, self.start_time)
+
+    def save(self, *args, **kwargs):
+        super(RecurrenceException, self).save(*args, **kwargs)
+        self.touch_rule()
+
+    def delete(self, *args, **kwargs):
+        super(RecurrenceException, self).delete(*args, **kwargs)
+        self.touch_rule()
+
+    def touch_rule(self):
+        # Changes the feed validators of the rule's calendars
+        RecurrenceRule.objects.filter(pk=self.rule_id).update(
+            updated=timezone.now())
 
 
 def create_event(
@@ -0,0 +1,102 @@
+"""
+Occurrence counts per day or week, for calendar overviews.
+
+Stored occurrences are counted in the database: their start times are
+truncated to the day in the current time zone and grouped by it, so only
+one row per day (and site or category) is read. Occurrences generated from
+recurrence rules are counted in Python and added.
+
+An occurrence is counted on the day it starts only. Weeks start on Monday
+and are keyed by the date of that Monday.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, DateTimeField, Func
+from django.utils import timezone
+
+from fullcalendar import recurrence
+
+
+PERIODS = ('day', 'week')
+
+# The field to group stored occurrences by and the attribute of their event
+# for every breakdown
+BREAKDOWNS = {
+    'site': ('site', 'site_id'),
+    'category': ('event__event_category', 'event_category_id'),
+}
+
+
+class StartDay(Func):
+    """
+    Truncates a datetime to the start of its day in the current time zone.
+    """
+
+    def __init__(self, expression):
+        super(StartDay, self).__init__(expression,
+                                       output_field=DateTimeField())
+
+    def as_sql(self, compiler, connection):
+        sql, params = compiler.compile(self.source_expressions[0])
+        tzname = timezone.get_current_timezone_name() \
+            if settings.USE_TZ else None
+        sql, tz_params = connection.ops.datetime_trunc_sql('day', sql, tzname)
+
+        return sql, params + tz_params
+
+
+def get_key(day, period):
+    if period == 'week':
+        day -= timedelta(days=day.weekday())
+
+    return day.isoformat()
+
+
+def count(queryset, rules, start, end, period='day', by=None):
+    """
+    Returns the number of occurrences of ``queryset`` and ``rules`` that
+    start from ``start`` to ``end``, as a dictionary mapping the first day
+    of every ``period`` with occurrences to the count. With ``by``, the
+    counts are dictionaries mapping the site or category id to the count
+    instead, with an empty string for events without a category.
+    """
+    field = attribute = None
+    if by is not None:
+        field, attribute = BREAKDOWNS[by]
+
+    counts = defaultdict(lambda: defaultdict(int))
+
+    rows = queryset.filter(
+        start_time__gte=start,
+        start_time__lt=end
+    ).order_by().annotate(
+        day=StartDay('start_time')
+    ).values_list(
+        *(('day', field) if field else ('day',))
+    ).annotate(count=Count('id'))
+
+    for row in rows:
+        group = row[1] if field else None
+        counts[get_key(row[0].date(), period)][group] += row[-1]
+
+    for rule in rules:
+        group = getattr(rule.event, attribute) if attribute else None
+
+        for start_time in recurrence.instances(rule, start, end):
+            if start_time >= start and start_time < end:
+                if settings.USE_TZ:
+                    start_time = timezone.localtime(start_time)
+                counts[get_key(start_time.date(), period)][group] += 1
+
+    if by is None:
+        return dict((key, groups[None]) for key, groups in counts.items())
+
+    return dict(
+        (key, dict(
+            ('' if group is None else str(group), number)
+            for group, number in groups.items()
+        ))
+        for key, groups in counts.items()
+    )
@@ -0,0 +1,188 @@
+"""
+Expansion of ``RecurrenceRule`` objects into occurrences.
+
+Occurrences generated from a rule are unsaved ``Occurrence`` instances, so
+they can be used wherever stored occurrences are, with the exception that
+they have no ``id``. Only cancelled and changed instances are stored, see
+``RecurrenceRule.materialize``.
+
+When the calendar cache is enabled, the instances of a rule are cached per
+requested period.
+"""
+from django.db import models
+
+from fullcalendar import cache
+from fullcalendar.conf import settings as fullcalendar_settings
+
+
+def instances(rule, start, end):
+    """
+    Returns the start times of the instances of ``rule`` overlapping the
+    period from ``start`` to ``end``.
+    """
+    if not cache.is_enabled():
+        return rule.between(start, end)
+
+    key = cache.make_key('rrule', rule.pk, start.isoformat(), end.isoformat())
+    start_times = cache.fetch(key)
+
+    if start_times is None:
+        start_times = rule.between(start, end)
+        cache.store(key, start_times)
+
+    return start_times
+
+
+def expand(rules, start, end):
+    """
+    Returns a sorted list of occurrences generated from ``rules`` that
+    overlap the period from ``start`` to ``end``.
+    """
+    occurrences = []
+
+    for rule in rules:
+        occurrences.extend(
+            rule.occurrence(start_time)
+            for start_time in instances(rule, start, end)
+        )
+
+    return sorted(occurrences)
+
+
+def sort_key(occurrence):
+    """
+    Returns the key upcoming occurrences are ordered by: their start and end
+    time, then stored occurrences by id before generated ones by rule.
+    """
+    rule = getattr(occurrence, 'recurrence_rule', None)
+
+    if occurrence.id is None and rule is not None:
+        return (occurrence.start_time, occurrence.end_time, 1, rule.id)
+
+    return (occurrence.start_time, occurrence.end_time, 0, occurrence.id)
+
+
+class Upcoming(object):
+    """
+    The occurrences of ``queryset`` merged with those generated from
+    ``rules`` that start on or after ``start``, ordered by ``sort_key``.
+
+    Nothing is queried or generated until the occurrences are counted,
+    sliced or iterated. A slice with a stop only fetches and generates that
+    many of each, and ``count`` counts the stored occurrences in the
+    database, so this can stand in for a queryset of upcoming occurrences in
+    list views, paginators and template tags. As rules may be open-ended,
+    generated occurrences are only included up to
+    ``FULLCALENDAR_RECURRENCE_HORIZON`` after ``start``.
+    """
+
+    def __init__(self, queryset, rules, start, after=None):
+        self.queryset = queryset.order_by('start_time', 'end_time', 'id')
+        self.rules = rules
+        self.start = start
+        self.after = after
+        self._result = None
+
+    @property
+    def model(self):
+        return self.queryset.model
+
+    @property
+    def end(self):
+        return self.start + \
+            fullcalendar_settings.FULLCALENDAR_RECURRENCE_HORIZON
+
+    def following(self, key):
+        """
+        Returns the occurrences that come after the ``sort_key`` ``key``.
+        """
+        start_time, end_time, generated, pk = key
+        after_times = (
+            models.Q(start_time__gt=start_time) |
+            models.Q(start_time=start_time, end_time__gt=end_time)
+        )
+        if not generated:
+            after_times |= models.Q(start_time=start_time,
+                                    end_time=end_time, id__gt=pk)
+
+        return Upcoming(
+            self.queryset.filter(after_times, start_time__gte=start_time),
+            self.rules, max(self.start, start_time), key)
+
+    def generate(self, start_times):
+        """
+        Returns the occurrences of ``rules`` at the start times returned by
+        ``start_times(rule)``, leaving out those that do not come after
+        ``after`` or start after ``end``.
+        """
+        occurrences = []
+
+        for rule in self.rules:
+            occurrences.extend(
+                occurrence for occurrence in (
+                    rule.occurrence(start_time)
+                    for start_time in start_times(rule)
+                    if self.start <= start_time <= self.end
+                )
+                if self.after is None or sort_key(occurrence) > self.after
+            )
+
+        return occurrences
+
+    def first(self, limit, offset=0):
+        """
+        Returns a list of the occurrences from position ``offset`` up to
+        ``limit``.
+        """
+        # One instance per rule may be left out for coming before ``after``
+        generated = sorted(
+            self.generate(lambda rule: rule.after(self.start, limit + 1)),
+            key=sort_key)[:limit]
+
+        # Positions before ``offset`` hold at most ``len(generated)``
+        # generated occurrences, so at least this many stored ones, which
+        # need not be fetched
+        skipped = max(0, offset - len(generated))
+
+        return sorted(list(self.queryset[skipped:limit]) + generated,
+                      key=sort_key)[offset - skipped:limit - skipped]
+
+    def all(self):
+        if self._result is None:
+            generated = self.generate(lambda rule: rule.between(self.start,
+                                                                self.end))
+            self._result = sorted(list(self.queryset) + generated,
+                                  key=sort_key)
+
+        return self._result
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+
+        if (self._result is not None or key.stop is None or key.stop < 0 or
+                (key.start or 0) < 0):
+            return self.all()[key]
+
+        return self.first(key.stop, key.start or 0)[::key.step]
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def __len__(self):
+        return len(self.all())
+
+    def __bool__(self):
+        return bool(self[:1])
+
+    __nonzero__ = __bool__
+
+    def count(self):
+        """
+        Returns the number of occurrences without fetching the stored ones.
+        """
+        if self._result is not None:
+            return len(self._result)
+
+        return self.queryset.count() + len(self.generate(
+            lambda rule: rule.between(self.start, self.end)))
@@ -0,0 +1,61 @@
+/*
+ * Event source for fullcalendar.io reading the compact format of
+ * calendar.json, see fullcalendar/compact.py.
+ *
+ *     $('#calendar').fullCalendar({
+ *         events: fullcalendarCompact.source('/events/calendar.json')
+ *     });
+ *
+ * Requires jQuery, like fullcalendar.io itself.
+ */
+(function (root, $) {
+    'use strict';
+
+    // Returns the event objects of a compact feed
+    function expand(data) {
+        var events = [],
+            i, event, color, item, property;
+
+        for (i = 0; i < data.event.length; i++) {
+            event = data.events[data.event[i]];
+            item = {
+                id: event[0],
+                title: data.titles.hasOwnProperty(i) ? data.titles[i] : event[1],
+                start: new Date(data.start[i] * 1000).toISOString(),
+                end: new Date(data.end[i] * 1000).toISOString(),
+                url: event[2] + data.key[i] + event[3]
+            };
+
+            if (event[4] !== null) {
+                color = data.colors[event[4]];
+                for (property in color) {
+                    if (color.hasOwnProperty(property)) {
+                        item[property] = color[property];
+                    }
+                }
+            }
+
+            events.push(item);
+        }
+
+        return events;
+    }
+
+    // Returns an event source function for the calendar feed at url
+    function source(url) {
+        return function (start, end, timezone, callback) {
+            $.getJSON(url, {
+                start: start.format('YYYY-MM-DD'),
+                end: end.format('YYYY-MM-DD'),
+                format: 'compact'
+            }, function (data) {
+                callback(expand(data));
+            });
+        };
+    }
+
+    root.fullcalendarCompact = {
+        expand: expand,
+        source: source
+    };
+}(this, jQuery));
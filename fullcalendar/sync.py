@@ -0,0 +1,64 @@
+"""
+Change tracking for the sync endpoint, enabled by setting
+``FULLCALENDAR_SYNC_RETENTION`` to a ``timedelta``.
+
+Changed occurrences are found through the ``updated`` timestamps Mezzanine
+keeps on occurrences and events. Deleted occurrences leave an
+``OccurrenceTombstone``, which is kept for the retention period; clients
+that last synced before that have to start over. Run the
+``prune_occurrence_tombstones`` management command periodically to delete
+older tombstones.
+
+A sync token is the time the previous sync started, in UTC.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from fullcalendar.conf import settings as fullcalendar_settings
+from fullcalendar.models import Occurrence, OccurrenceTombstone
+
+
+TOKEN_FORMAT = '%Y%m%dT%H%M%S%f'
+
+
+def is_enabled():
+    return bool(fullcalendar_settings.FULLCALENDAR_SYNC_RETENTION)
+
+
+def make_token(value):
+    return timezone.make_naive(value, timezone.utc).strftime(TOKEN_FORMAT)
+
+
+def parse_token(token):
+    """
+    Returns the time of a sync token, or raises ``ValueError`` if it is
+    invalid.
+    """
+    value = datetime.strptime(token, TOKEN_FORMAT)
+
+    if settings.USE_TZ:
+        value = timezone.make_aware(value, timezone.utc)
+
+    return value
+
+
+def is_expired(since):
+    """
+    Whether deletions since ``since`` may have been pruned already.
+    """
+    return since < (timezone.now() -
+                    fullcalendar_settings.FULLCALENDAR_SYNC_RETENTION)
+
+
+@receiver(post_delete, sender=Occurrence)
+def record_deletion(sender, instance, **kwargs):
+    if is_enabled():
+        OccurrenceTombstone.objects.create(
+            occurrence_id=instance.id,
+            site_id=instance.site_id,
+            deleted=timezone.now()
+        )
@@ -1,135 +1,195 @@
 from django.conf import settings
 from django.contrib.sites.models import Site
-from django.utils import timezone
+from django.utils import lru_cache, six, timezone, translation
+from django.utils.dates import MONTHS, WEEKDAYS
 
 from mezzanine import template
 from mezzanine.conf import settings as me_settings
 from mezzanine.utils.sites import current_site_id
 
+from fullcalendar import cache, conf
 from fullcalendar.models import Occurrence
 
-import locale
-
 register = template.Library()
 
 
+def get_upcoming(context, name, queryset, kwargs):
+    """
+    Returns the occurrences in ``queryset``, at most ``kwargs['limit']``.
+    ``queryset`` is a lazy sequence of upcoming occurrences, see
+    ``OccurrenceManager.upcoming_with_recurrences``.
+
+    With ``FULLCALENDAR_AGENDA_CACHE_TIMEOUT`` set, a list of the occurrences
+    is cached per tag ``name``, site, limit and whether the user can see
+    unpublished occurrences.
+    """
+    limit = kwargs.get('limit')
+
+    if limit is not None:
+        queryset = queryset[:int(limit)]
+
+    if not cache.is_agenda_enabled():
+        return queryset
+
+    key = cache.make_key('agenda', name, current_site_id(), limit,
+                         int(context['request'].user.is_staff))
+    occurrences = cache.fetch(key)
+
+    if occurrences is None:
+        occurrences = list(queryset)
+        cache.store_agenda(key, occurrences)
+
+    return occurrences
+
+
 @register.inclusion_tag('events/agenda_tag.html', takes_context=True)
 def show_agenda(context, *args, **kwargs):
-    qs = Occurrence.objects.upcoming(for_user=context['request'].user)
-
-    if 'limit' in kwargs:
-        qs = qs[:int(kwargs['limit'])]
+    qs = Occurrence.objects.upcoming_with_recurrences(
+        for_user=context['request'].user)
 
     return {
-        'occurrences': qs,
+        'occurrences': get_upcoming(context, 'all', qs, kwargs),
         'all_sites': True,
     }
 
 
 @register.assignment_tag(takes_context=True)
 def get_agenda(context, *args, **kwargs):
-    qs = Occurrence.objects.upcoming(for_user=context['request'].user)
+    qs = Occurrence.objects.upcoming_with_recurrences(
+        for_user=context['request'].user)
 
-    if 'limit' in kwargs:
-        return qs[:int(kwargs['limit'])]
-
-    return qs
+    return get_upcoming(context, 'all', qs, kwargs)
 
 
 @register.inclusion_tag('events/agenda_tag.html', takes_context=True)
 def show_site_agenda(context, *args, **kwargs):
-    qs = Occurrence.site_related.upcoming(for_user=context['request'].user)
-
-    if 'limit' in kwargs:
-        qs = qs[:int(kwargs['limit'])]
+    qs = Occurrence.site_related.upcoming_with_recurrences(
+        for_user=context['request'].user)
 
     return {
-        'occurrences': qs
+        'occurrences': get_upcoming(context, 'site', qs, kwargs)
     }
 
 
 @register.assignment_tag(takes_context=True)
 def get_site_agenda(context, *args, **kwargs):
-    qs = Occurrence.site_related.upcoming(for_user=context['request'].user)
+    qs = Occurrence.site_related.upcoming_with_recurrences(
+        for_user=context['request'].user)
 
-    if 'limit' in kwargs:
-        return qs[:int(kwargs['limit'])]
-
-    return qs
+    return get_upcoming(context, 'site', qs, kwargs)
 
 
 @register.assignment_tag(takes_context=True)
 def get_main_agenda(context, *args, **kwargs):
-    qs_main = Occurrence.objects.upcoming(for_user=context['request'].user).filter(
-        event__site__id__exact=1)
+    from fullcalendar.conf import settings as fc_settings
 
-    if 'limit' in kwargs:
-        return qs_main[:int(kwargs['limit'])]
+    qs_main = Occurrence.objects.upcoming_with_recurrences(
+        for_user=context['request'].user,
+        site_ids=[fc_settings.FULLCALENDAR_MAIN_SITE_ID])
 
-    return qs_main
+    return get_upcoming(context, 'main', qs_main, kwargs)
 
 
 @register.assignment_tag(takes_context=True)
 def get_site_and_main_agenda(context, *args, **kwargs):
-    qs_main = Occurrence.objects.upcoming(for_user=context['request'].user).filter(
-        event__site__id__exact=1)
-    qs_site = get_site_agenda(context, *args, **kwargs)
-    qs = qs_main | qs_site
+    from fullcalendar.conf import settings as fc_settings
 
-    if 'limit' in kwargs:
-        return qs[:int(kwargs['limit'])]
+    qs = Occurrence.objects.upcoming_with_recurrences(
+        for_user=context['request'].user,
+        site_ids=set([fc_settings.FULLCALENDAR_MAIN_SITE_ID,
+                      current_site_id()]))
 
-    return qs
+    return get_upcoming(context, 'site_and_main', qs, kwargs)
+
+
+@lru_cache.lru_cache()
+def get_date_names(language):
+    """
+    Returns the translated weekday and month names of ``language``, as a
+    list of weekday names starting on Monday and a list of month names
+    starting on January. The names are translated once per language.
+    """
+    with translation.override(language):
+        return (
+            [six.text_type(WEEKDAYS[day]) for day in range(7)],
+            [six.text_type(MONTHS[month]) for month in range(1, 13)],
+        )
+
+
+def format_datetime(value, date_names):
+    """
+    Formats ``value`` like ``strftime('%A %d %B %Y %H:%M')`` in the language
+    of ``date_names``, without changing the process wide locale.
+    """
+    weekdays, months = date_names
+
+    return '%s %02d %s %d %02d:%02d' % (
+        weekdays[value.weekday()], value.day, months[value.month - 1],
+        value.year, value.hour, value.minute)
 
 
 @register.simple_tag
 def occurrence_duration(occurrence):
     start = timezone.localtime(occurrence.start_time)
     end = timezone.localtime(occurrence.end_time)
-    lang = me_settings.LANGUAGE_CODE.replace('-', '_') + ".UTF-8"
-    locale.setlocale(locale.LC_TIME, lang)
-    result = start.strftime('%A %d %B %Y %H:%M')
+    date_names = get_date_names(me_settings.LANGUAGE_CODE)
+    result = format_datetime(start, date_names)
 
     if (start.day == end.day and start.month == end.month and
             start.year == end.year):
         result += ' - {:%H:%M}'.format(end)
     else:
-        result += ' - {:%A %d %B %Y %H:%M}'.format(end)
+        result += ' - ' + format_datetime(end, date_names)
 
     return result
 
 
 @register.inclusion_tag("events/site_legend.html")
 def events_site_legend():
-    from fullcalendar.conf import settings as fc_settings
-
-    sites = {}
-    for site in Site.objects.all():
-        sites[site.id] = (site.name, site.domain)
-
+    """
+    The colors of the sites in ``FULLCALENDAR_SITE_COLORS``, on the main
+    site only. With ``FULLCALENDAR_CACHE_TIMEOUT`` set, the legend is cached
+    until a site or the setting changes.
+    """
     context = {
         'legend': {}
     }
     if current_site_id() != settings.SITE_ID:
         return context
-    for site, color in fc_settings.FULLCALENDAR_SITE_COLORS.items():
-        data = {}
-        if type(color) == str:
-            data['backgroundColor'] = color
-            data['textColor'] = 'white'
-            data['borderColor'] = color
-        else:
-            if len(color) == 2:
-                data['backgroundColor'] = color[0]
-                data['textColor'] = color[1]
-                data['borderColor'] = color[0]
-            elif len(color) > 2:
-                data['backgroundColor'] = color[0]
-                data['textColor'] = color[1]
-                data['borderColor'] = color[2]
-
-        site_name, site_domain = sites[site]
-        data['siteDomain'] = site_domain
-        context['legend'][site_name] = data
+
+    site_colors = conf.get_site_colors()
+    if not site_colors:
+        return context
+
+    if cache.is_enabled():
+        key = cache.make_key('legend', sorted(site_colors.items()))
+        legend = cache.fetch(key)
+        if legend is None:
+            legend = get_site_legend(site_colors)
+            cache.store(key, legend)
+    else:
+        legend = get_site_legend(site_colors)
+
+    context['legend'] = legend
 
     return context
+
+
+def get_site_legend(site_colors):
+    """
+    Returns the legend data per site name for ``site_colors``, as returned
+    by ``fullcalendar.conf.get_site_colors``.
+    """
+    legend = {}
+
+    for site_id, name, domain in Site.objects.filter(
+            id__in=site_colors).values_list('id', 'name', 'domain'):
+        background, text, border = site_colors[site_id]
+        legend[name] = {
+            'backgroundColor': background,
+            'textColor': 'white' if text is None else text,
+            'borderColor': border,
+            'siteDomain': domain,
+        }
+
+    return legend
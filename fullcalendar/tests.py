@@ -0,0 +1,290 @@
+"""
+Query count regression tests: the calendar feed, the agenda and the agenda
+template tags run the same number of queries however many occurrences they
+return, on the main site and on other sites.
+
+Tests of the ``import_ics`` management command.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+import os
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sites.models import Site
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import connection
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import six, timezone
+import pytz
+
+from fullcalendar.conf import settings as fullcalendar_settings
+from fullcalendar.models import Event, EventCategory, Occurrence, \
+    RecurrenceRule
+
+
+@contextmanager
+def other_site(site_id):
+    '''
+    Make ``current_site_id`` return ``site_id`` instead of ``SITE_ID``.
+    '''
+    previous = os.environ.get('MEZZANINE_SITE_ID')
+    os.environ['MEZZANINE_SITE_ID'] = str(site_id)
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ['MEZZANINE_SITE_ID']
+        else:
+            os.environ['MEZZANINE_SITE_ID'] = previous
+
+
+@override_settings(
+    ROOT_URLCONF='fullcalendar.urls',
+    FULLCALENDAR_CACHE_TIMEOUT=0,
+    FULLCALENDAR_AGENDA_CACHE_TIMEOUT=0,
+    FULLCALENDAR_SITE_COLORS={},
+)
+class QueryCountTestCase(TestCase):
+
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0) + \
+            timedelta(hours=1)
+        self.sub_site = Site.objects.create(domain='sub.example.com',
+                                            name='sub')
+        self.created = 0
+
+        # A weekly rule on each site, so generated occurrences are listed too
+        for site in Site.objects.all():
+            event = Event.objects.create(title='Weekly', site=site)
+            RecurrenceRule.objects.create(
+                event=event, rule='FREQ=WEEKLY', start_time=self.start,
+                end_time=self.start + timedelta(hours=1))
+
+    def add_occurrences(self, count):
+        '''
+        Add ``count`` events with an occurrence each, alternating between
+        the main site and the other site, each event with its own category.
+        '''
+        main_site_id = Site.objects.get_current().id
+
+        for i in range(self.created, self.created + count):
+            site_id = self.sub_site.id if i % 2 else main_site_id
+            category = EventCategory.objects.create(
+                name='Category %d' % i, color='#%06d' % i, site_id=site_id)
+            event = Event.objects.create(
+                title='Event %d' % i, event_category=category,
+                site_id=site_id)
+            start_time = self.start + timedelta(hours=i)
+            Occurrence.objects.create(
+                event=event, start_time=start_time,
+                end_time=start_time + timedelta(hours=1), site_id=site_id)
+
+        self.created += count
+
+    def assertConstantQueries(self, num, func):
+        '''
+        Assert that ``func`` runs ``num`` queries with a few occurrences
+        and with many.
+        '''
+        for count in (4, 20):
+            self.add_occurrences(count)
+            with self.assertNumQueries(num):
+                func()
+
+    def get(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+
+        return response
+
+    def calendar_json(self):
+        return self.get('/calendar.json',
+                        start=self.start.date().isoformat(),
+                        end=(self.start + timedelta(days=7)).date().isoformat())
+
+    def test_calendar_json(self):
+        self.assertConstantQueries(5, self.calendar_json)
+
+    @override_settings(FULLCALENDAR_CACHE_TIMEOUT=60)
+    def test_calendar_json_invalid_range(self):
+        # The cache key is made before the range is parsed
+        response = self.client.get('/calendar.json', {
+            'start': u'2026-10-\xe9', 'end': u'\u2603'})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_calendar_json_other_site(self):
+        with other_site(self.sub_site.id):
+            self.assertConstantQueries(5, self.calendar_json)
+
+    def test_agenda_json(self):
+        self.assertConstantQueries(
+            3, lambda: self.get('/agenda.json'))
+
+    def test_agenda_json_other_site(self):
+        with other_site(self.sub_site.id):
+            self.assertConstantQueries(
+                3, lambda: self.get('/agenda.json'))
+
+    def test_agenda_json_next_page(self):
+        self.add_occurrences(30)
+        cursor = self.get('/agenda.json').json()['next']
+
+        self.assertConstantQueries(
+            3, lambda: self.get('/agenda.json', cursor=cursor))
+
+    def agenda_page(self):
+        paginator = Paginator(
+            Occurrence.objects.upcoming_with_recurrences(), 10)
+
+        return list(paginator.page(2).object_list)
+
+    def test_agenda_page(self):
+        self.assertConstantQueries(4, self.agenda_page)
+
+        # Counted and sliced in the database, not fetched as a whole
+        with CaptureQueriesContext(connection) as queries:
+            self.agenda_page()
+        for query in queries.captured_queries:
+            if 'FROM "events_occurrence"' in query['sql']:
+                self.assertRegexpMatches(query['sql'], r'COUNT|LIMIT')
+
+    def render_tag(self, tag):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        template = engines['django'].from_string(
+            '{% load fullcalendar %}{% ' + tag + ' limit=50 as occurrences %}'
+            '{% for occurrence in occurrences %}'
+            '{{ occurrence.title }} {{ occurrence.get_absolute_url }} '
+            '{{ occurrence.site.domain }} {{ occurrence.event.site.domain }} '
+            '{{ occurrence.event_category.color }}'
+            '{% endfor %}'
+        )
+
+        return template.render({'request': request})
+
+    def test_agenda_tags(self):
+        for tag in ('get_agenda', 'get_site_agenda', 'get_main_agenda',
+                    'get_site_and_main_agenda'):
+            self.assertConstantQueries(3, lambda: self.render_tag(tag))
+
+    def test_agenda_tags_other_site(self):
+        with other_site(self.sub_site.id):
+            for tag in ('get_site_agenda', 'get_site_and_main_agenda'):
+                self.assertConstantQueries(
+                    3, lambda: self.render_tag(tag))
+
+
+class ImportICSTestCase(TestCase):
+
+    def import_ics(self, *lines, **options):
+        '''
+        Import a calendar of ``lines``, given as text or bytes, and return
+        what was written to stderr.
+        '''
+        content = b'\r\n'.join(
+            line if isinstance(line, bytes) else line.encode('utf-8')
+            for line in ('BEGIN:VCALENDAR', 'VERSION:2.0') + lines +
+            ('END:VCALENDAR', '')
+        )
+        with tempfile.NamedTemporaryFile(suffix='.ics') as ics:
+            ics.write(content)
+            ics.flush()
+            stderr = six.StringIO()
+            call_command('import_ics', ics.name, stdout=six.StringIO(),
+                         stderr=stderr, **options)
+
+        return stderr.getvalue()
+
+    def test_time_zone(self):
+        # Weekly at 10:00 in Amsterdam, across the switch to summer time on
+        # 29 March, without the instance of 2 April
+        self.import_ics(
+            'BEGIN:VEVENT',
+            'UID:weekly',
+            'SUMMARY:Weekly',
+            'DTSTART;TZID=Europe/Amsterdam:20260305T100000',
+            'DTEND;TZID=Europe/Amsterdam:20260305T110000',
+            'RRULE:FREQ=WEEKLY;COUNT=6',
+            'EXDATE;TZID=Europe/Amsterdam:20260402T100000',
+            'END:VEVENT',
+        )
+        amsterdam = pytz.timezone('Europe/Amsterdam')
+
+        self.assertEqual(
+            [occurrence.start_time.astimezone(amsterdam).strftime(
+                '%m-%d %H:%M')
+             for occurrence in Occurrence.objects.order_by('start_time')],
+            ['03-05 10:00', '03-12 10:00', '03-19 10:00', '03-26 10:00',
+             '04-09 10:00']
+        )
+        self.assertEqual(Event.objects.get().recurrence,
+                         'FREQ=WEEKLY;COUNT=6')
+
+    def test_all_day_until(self):
+        self.import_ics(
+            'BEGIN:VEVENT',
+            'UID:all-day',
+            'SUMMARY:All day',
+            'DTSTART;VALUE=DATE:20261101',
+            'RRULE:FREQ=WEEKLY;UNTIL=20261129',
+            'END:VEVENT',
+        )
+        occurrences = Occurrence.objects.order_by('start_time')
+
+        self.assertEqual(occurrences.count(), 5)
+        self.assertEqual(occurrences[0].end_time - occurrences[0].start_time,
+                         timedelta(days=1))
+
+    def test_open_ended_rule(self):
+        self.import_ics(
+            'BEGIN:VEVENT',
+            'UID:daily',
+            'SUMMARY:Daily',
+            'DTSTART:20261020T100000Z',
+            'RRULE:FREQ=DAILY',
+            'END:VEVENT',
+        )
+        horizon = timezone.now() + \
+            fullcalendar_settings.FULLCALENDAR_RECURRENCE_HORIZON
+
+        self.assertEqual(Event.objects.get().recurrence, '')
+        self.assertFalse(Occurrence.objects.filter(
+            start_time__gt=horizon).exists())
+
+    def test_too_many_occurrences(self):
+        stderr = self.import_ics(
+            'BEGIN:VEVENT',
+            'UID:minutely',
+            'SUMMARY:Minutely',
+            'DTSTART:20261101T090000Z',
+            'RRULE:FREQ=MINUTELY;UNTIL=20991231T000000Z',
+            'END:VEVENT',
+            max_occurrences=100
+        )
+
+        self.assertIn('Skipped minutely: more than 100 occurrences', stderr)
+        self.assertFalse(Event.objects.exists())
+
+    def test_malformed_events(self):
+        stderr = self.import_ics(
+            'BEGIN:VEVENT',
+            'UID:broken',
+            'SUMMARY:Broken',
+            'DTSTART:notadate',
+            'END:VEVENT',
+            'BEGIN:VEVENT',
+            'UID:folded',
+            # The folding splits the two bytes of the e acute
+            b'SUMMARY:Caf\xc3',
+            b' \xa9',
+            'DTSTART:20261101T090000Z',
+            'END:VEVENT',
+        )
+
+        self.assertIn('Skipped broken', stderr)
+        self.assertEqual(Event.objects.get().title, u'Caf\xe9')
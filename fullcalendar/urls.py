@@ -14,6 +14,24 @@ urlpatterns = patterns('',
         name='fullcalendar-calendar-json'
     ),
 
+    url(
+        r'^calendar-batch.json$',
+        views.BatchJSONView.as_view(),
+        name='fullcalendar-calendar-batch-json'
+    ),
+
+    url(
+        r'^overview.json$',
+        views.OverviewJSONView.as_view(),
+        name='fullcalendar-overview-json'
+    ),
+
+    url(
+        r'^sync.json$',
+        views.SyncJSONView.as_view(),
+        name='fullcalendar-sync-json'
+    ),
+
     url(
         r'^calendar/(?P<year>\d{4})/$',
         views.CalendarView.as_view(),
@@ -32,12 +50,24 @@ urlpatterns = patterns('',
         name='fullcalendar-agenda'
     ),
 
+    url(
+        r'^agenda.json$',
+        views.AgendaJSONView.as_view(),
+        name='fullcalendar-agenda-json'
+    ),
+
     url(
         r'^event/(?P<event_slug>[\w-]+)/(?P<pk>\d+)/$',
         views.OccurrenceView.as_view(),
         name='fullcalendar-occurrence'
     ),
 
+    url(
+        r'^event/(?P<event_slug>[\w-]+)/(?P<rule_id>\d+)/(?P<start>\d{8}T\d{6}Z?)/$',
+        views.RecurrenceView.as_view(),
+        name='fullcalendar-recurrence'
+    ),
+
     url(
         r'^ical/$',
         views.ical_view,
@@ -1,13 +1,20 @@
 from datetime import datetime, timedelta
+from functools import reduce
+from itertools import chain, groupby
+import hashlib
+import operator
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.core.urlresolvers import reverse
 from django.db import models
-from django.http import JsonResponse, Http404, HttpResponse
+from django.http import JsonResponse, Http404, HttpResponse, \
+    StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 from django.utils import timezone
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView, DetailView
 from django.views.generic.list import MultipleObjectTemplateResponseMixin, \
     ListView
@@ -15,7 +22,92 @@ from django.views.generic.dates import BaseDateListView, YearMixin, MonthMixin
 from mezzanine.utils.sites import current_site_id
 import icalendar
 
-from fullcalendar.models import Occurrence
+from fullcalendar import cache, conf, encoders, instrumentation, \
+    overview, recurrence, sync
+from fullcalendar.compact import CompactFeed
+from fullcalendar.formats import format_datetimes
+from fullcalendar.instrumentation import InstrumentedViewMixin, instrumented
+from fullcalendar.models import Event, FeedEntry, Occurrence, \
+    OccurrenceBucket, OccurrenceTombstone, RecurrenceRule
+
+
+def get_validators(*querysets):
+    """
+        Returns an (etag, last_modified) tuple for the given querysets of
+        occurrences or recurrence rules, based on the number of objects and
+        the most recent ``updated`` timestamp of them and their events.
+
+        The ETag also covers the event category colors and site domains of
+        the events, which the feeds show but which have no timestamp, so
+        editing one changes the ETag, though not ``Last-Modified``. They are
+        read in the same query, grouped by, for the objects of the
+        querysets only.
+    """
+
+    count = 0
+    last_modified = None
+    presentation = set()
+
+    for queryset in querysets:
+        groups = queryset.order_by().values_list(
+            'event__event_category__color', 'event__site__domain'
+        ).annotate(
+            count=models.Count('id'),
+            last_modified=models.Max('updated'),
+            event_last_modified=models.Max('event__updated')
+        )
+        for color, domain, group_count, group_last_modified, \
+                event_last_modified in groups:
+            count += group_count
+            presentation.add((color or '', domain))
+            for value in (group_last_modified, event_last_modified):
+                if value and (last_modified is None or value > last_modified):
+                    last_modified = value
+
+    etag = hashlib.md5(u'{}-{}-{}'.format(
+        count,
+        last_modified.isoformat() if last_modified else '',
+        sorted(presentation)
+    ).encode('utf-8')).hexdigest()
+
+    return etag, last_modified
+
+
+def conditional_response(request, validators, render):
+    """
+        Returns a 304 Not Modified response if the client's copy matches the
+        given (etag, last_modified) validators, otherwise the response
+        returned by ``render()``.
+    """
+
+    etag, last_modified = validators
+
+    @condition(etag_func=lambda request: etag,
+               last_modified_func=lambda request: last_modified)
+    def view(request):
+        return render()
+
+    return view(request)
+
+
+def json_response(data, **response_kwargs):
+    """
+        Returns a JSON response for ``data``, encoded with the encoder set in
+        ``FULLCALENDAR_JSON_ENCODER``, see ``fullcalendar.encoders``.
+    """
+
+    encoder = encoders.get_encoder()
+
+    if encoder is None:
+        return JsonResponse(data, safe=False, **response_kwargs)
+
+    response_kwargs.setdefault('content_type', 'application/json')
+    return HttpResponse(encoder(data), **response_kwargs)
+
+
+# Reversed in place of the occurrence id to build the occurrence URLs of an
+# event by string concatenation
+occurrence_id_placeholder = '0000000000'
 
 
 class JSONResponseMixin:
@@ -28,11 +120,10 @@ class JSONResponseMixin:
             Returns a JSON response based on the context
         """
 
-        return JsonResponse(
-            self.get_data(context),
-            safe=False,
-            **response_kwargs
-        )
+        data = self.get_data(context)
+
+        with instrumentation.timing('serialization'):
+            return json_response(data, **response_kwargs)
 
     def get_data(self, context):
         return context
@@ -177,8 +268,33 @@ class BaseDateRangeView(DateRangeMixin, DateMixin2, BaseDateListView):
             certain date range
         """
 
-        start = self.get_start()
-        end = self.get_end()
+        date_start, date_end = self.parse_range(self.get_start(),
+                                                self.get_end())
+        date_field = self.get_date_field()
+        date_field2 = self.get_date_field2()
+
+        # Select all objects which at least have some overlapping with the
+        # given range. This means the end date of an object should be greater
+        # than the given start date, and the start date of an object should be
+        # smaller than the given end date.
+        date_filter = {
+            '%s__gte' % date_field2: date_start,
+            '%s__lte' % date_field: date_end
+        }
+
+        qs = self.get_dated_queryset(**date_filter)
+        qs = qs.filter(self.get_range_filter(date_start, date_end))
+        date_list = self.get_date_list(qs)
+
+        return (date_list, qs, {
+            'date_start': date_start,
+            'date_end': date_end,
+        })
+
+    def parse_range(self, start, end):
+        """
+            Returns the start and end date strings as UTC datetimes
+        """
 
         try:
             start_time = datetime.strptime(start, self.get_start_format())
@@ -198,112 +314,602 @@ class BaseDateRangeView(DateRangeMixin, DateMixin2, BaseDateListView):
                 " '{format}"
             ).format(datestr=end, format=self.get_end_format()))
 
-        date_field = self.get_date_field()
-        date_field2 = self.get_date_field2()
-
-        # Select all objects which at least have some overlapping with the
-        # given range. This means the end date of an object should be greater
-        # than the given start date, and the start date of an object should be
-        # smaller than the given end date.
-        date_filter = {
-            '%s__gte' % date_field2: date_start,
-            '%s__lte' % date_field: date_end
-        }
+        return date_start, date_end
 
-        qs = self.get_dated_queryset(**date_filter)
-        date_list = self.get_date_list(qs)
+    def get_range_filter(self, date_start, date_end):
+        """
+            Returns an extra ``Q`` object to narrow down the objects in the
+            given range, e.g. using an index. Empty by default.
+        """
 
-        return (date_list, qs, {})
+        return models.Q()
 
 
 class BaseCalendarView(MultipleObjectTemplateResponseMixin, BaseDateRangeView):
     template_name_suffix = "_calendar"
 
 
-class CalendarJSONView(JSONResponseMixin, BaseCalendarView):
+class CalendarJSONView(InstrumentedViewMixin, JSONResponseMixin,
+                       BaseCalendarView):
     model = Occurrence
     date_field = "start_time"
     date_field2 = "end_time"
 
     def get_queryset(self):
+        return self.get_manager().for_display(for_user=self.request.user)
+
+    def get_manager(self):
         if current_site_id() == settings.SITE_ID:
-            return self.model.objects.published(for_user=self.request.user).select_related(
-                'event').select_related('site')
+            return self.model.objects
         else:
-            return self.model.site_related.published(for_user=self.request.user).select_related(
-                'event'
-            ).select_related(
-                'site'
-            )
+            return self.model.site_related
 
-    def render_to_response(self, context, **kwargs):
-        context = self.get_context_data()
+    def get_recurrence_rules(self):
+        return self.get_manager().get_recurrence_rules(
+            for_user=self.request.user)
+
+    def get_recurrences(self, context):
+        """
+            Returns the occurrences generated from recurrence rules in the
+            requested range.
+        """
+
+        return recurrence.expand(self.get_recurrence_rules(),
+                                 context['date_start'], context['date_end'])
+
+    def get_validators(self):
+        return get_validators(self.get_dated_items()[1],
+                              self.get_recurrence_rules())
+
+    def get(self, request, *args, **kwargs):
+        get = super(CalendarJSONView, self).get
+
+        if not cache.is_enabled():
+            validators = self.get_validators()
+            return conditional_response(
+                request, validators, lambda: get(request, *args, **kwargs))
+
+        key = self.get_cache_key()
+        entry = cache.fetch(key)
+
+        if entry is None:
+            validators = self.get_validators()
+
+            def render():
+                response = get(request, *args, **kwargs)
+                cache.store(key, (response.content,) + validators)
+                return response
+        else:
+            content, validators = entry[0], entry[1:]
 
+            def render():
+                return HttpResponse(content, content_type='application/json')
+
+        return conditional_response(request, validators, render)
+
+    def get_date_list(self, queryset, date_type=None, ordering='ASC'):
+        # The JSON views do not use ``date_list``, skip its query
+        return None
+
+    def get_cache_key(self):
+        return cache.make_key(
+            'json',
+            current_site_id(),
+            self.get_start(),
+            self.get_end(),
+            self.get_format(),
+            int(self.request.user.is_staff)
+        )
+
+    def get_format(self):
+        """
+            Returns the requested feed format, ``full`` (default) or
+            ``compact``, see ``fullcalendar.compact``.
+        """
+
+        feed_format = self.request.GET.get('format', 'full')
+        if feed_format not in ('full', 'compact'):
+            raise Http404(_("Invalid format '{format}'").format(
+                format=feed_format))
+
+        return feed_format
+
+    def get_range_filter(self, date_start, date_end):
+        return OccurrenceBucket.objects.lookup(date_start, date_end)
+
+    def render_to_response(self, context, **kwargs):
         return self.render_to_json_response(context, **kwargs)
 
-    def get_data(self, context):
+    def get_rows(self, context):
+        """
+            Returns the occurrences in the requested range as (id, title,
+            start_time, end_time, event, occurrence) tuples. ``occurrence`` is
+            only set for occurrences generated from recurrence rules, which
+            are not stored.
+
+            With ``FULLCALENDAR_LEAN_JSON``, only these columns of the stored
+            occurrences are selected, without creating model instances, and
+            their events are loaded once each with a second query.
+
+            With ``FULLCALENDAR_FEED_TABLE``, only the generated occurrences
+            are returned, see ``get_feed_entries``.
+        """
         from fullcalendar.conf import settings as fc_settings
+        qs = context['object_list']
+
+        if fc_settings.FULLCALENDAR_FEED_TABLE:
+            stored = []
+        elif fc_settings.FULLCALENDAR_LEAN_JSON:
+            events = Event._base_manager.filter(
+                id__in=qs.order_by().values('event')
+            ).select_related('site', 'event_category').only(
+                'slug', 'site', 'site__domain', 'event_category',
+                'event_category__color'
+            )
+            events = dict((event.id, event) for event in events)
+            stored = [
+                (occurrence_id, title, start_time, end_time, events[event_id],
+                 None)
+                for occurrence_id, title, start_time, end_time, event_id
+                in qs.values_list('id', 'title', 'start_time', 'end_time',
+                                  'event')
+            ]
+        else:
+            stored = [
+                (occurrence.id, occurrence.title, occurrence.start_time,
+                 occurrence.end_time, occurrence.event, None)
+                for occurrence in qs
+            ]
+
+        return stored + [
+            (None, occurrence.title, occurrence.start_time,
+             occurrence.end_time, occurrence.event, occurrence)
+            for occurrence in self.get_recurrences(context)
+        ]
+
+    def get_feed_entries(self, context, site_colors, with_times=False):
+        """
+            Returns the JSON data of the stored occurrences selected by
+            ``get_feed_filter``, read from the ``FeedEntry`` table in a
+            single query. With ``with_times``, (start_time, end_time, data)
+            tuples are returned instead.
+        """
+
+        entries = FeedEntry.objects.published(
+            for_user=self.request.user
+        ).filter(self.get_feed_filter(context))
+
+        if site_colors is None:
+            entries = entries.filter(site__id=current_site_id())
+
+        columns = ['event', 'title', 'start', 'end', 'url', 'site', 'color']
+        if with_times:
+            columns += ['start_time', 'end_time']
+
         events = []
+        for row in entries.values_list(*columns):
+            event_id, title, start, end, url, site_id, color = row[:7]
+            data = {
+                'id': str(event_id),
+                'title': title,
+                'start': start,
+                'end': end,
+                'url': url,
+            }
+
+            if site_colors is not None:
+                if site_id in site_colors:
+                    data.update(site_colors[site_id])
+            elif color:
+                data['color'] = color
+
+            events.append((row[7], row[8], data) if with_times else data)
+
+        return events
+
+    def get_feed_filter(self, context):
+        """
+            Returns a ``Q`` object selecting the feed entries in the requested
+            range.
+        """
+
+        return models.Q(end_time__gte=context['date_start'],
+                        start_time__lte=context['date_end'])
+
+    def get_event_data(self, event, site_colors):
+        """
+            Returns the part of the JSON data that is the same for all
+            occurrences of ``event``: its id, the site URL, the occurrence URL
+            split around the occurrence id, and the colors.
 
-        for occurrence in context['object_list']:
-            start_time = occurrence.start_time
+            ``site_colors`` is the result of ``get_site_colors``.
+        """
+
+        site_url = "//" + event.site.domain
+        url = reverse('fullcalendar-occurrence',
+                      args=[event.slug, occurrence_id_placeholder])
+        url_prefix, url_suffix = url.rsplit(occurrence_id_placeholder, 1)
 
-            if timezone.is_naive(start_time):
-                start_time = timezone.make_aware(
-                    start_time,
-                    timezone.get_default_timezone()
-                )
+        colors = {}
+        if site_colors is not None:
+            colors = site_colors.get(event.site_id, colors)
+        else:
+            # Otherwise, use category color if set
+            if event.event_category and event.event_category.color:
+                colors = {'color': event.event_category.color}
 
-            start_json = start_time.strftime('%Y-%m-%dT%H:%M:%S%z')
-            start_json = start_json[:-2] + ":" + start_json[-2:]
+        return (str(event.id), site_url, site_url + url_prefix, url_suffix,
+                colors)
+
+    def get_site_colors(self):
+        """
+            Returns the event color options per site id on the main site,
+            where events are colored per site, and ``None`` elsewhere. See
+            ``fullcalendar.conf.get_site_color_options``.
+        """
 
-            end_time = occurrence.end_time
+        if current_site_id() == settings.SITE_ID:
+            return conf.get_site_color_options()
 
-            if timezone.is_naive(end_time):
-                end_time = timezone.make_aware(
-                    end_time,
-                    timezone.get_default_timezone()
-                )
+        return None
 
-            end_json = end_time.strftime('%Y-%m-%dT%H:%M:%S%z')
-            end_json = end_json[:-2] + ":" + end_json[-2:]
+    def serialize_rows(self, rows, site_colors):
+        """
+            Returns the JSON data of rows as returned by ``get_rows``.
+        """
+
+        events = []
+        starts = format_datetimes([row[2] for row in rows])
+        ends = format_datetimes([row[3] for row in rows])
+        event_data = {}
+
+        for row, start_json, end_json in zip(rows, starts, ends):
+            occurrence_id, title, event, occurrence = \
+                row[0], row[1], row[4], row[5]
+            if event.id not in event_data:
+                event_data[event.id] = self.get_event_data(event, site_colors)
+            event_id, site_url, url_prefix, url_suffix, colors = \
+                event_data[event.id]
+
+            if occurrence is not None:
+                # Generated from a recurrence rule
+                url = site_url + occurrence.get_absolute_url()
+            else:
+                url = url_prefix + str(occurrence_id) + url_suffix
 
             data = {
-                'id': str(occurrence.event.id),
-                'title': occurrence.title,
+                'id': event_id,
+                'title': title,
                 'start': start_json,
                 'end': end_json,
-                'url': "//" + occurrence.event.site.domain +
-                       occurrence.get_absolute_url(),
+                'url': url,
             }
-
-            # Determine color
-            if current_site_id() == settings.SITE_ID:
-                # Main site, display event color per subsite
-                event_site = occurrence.event.site.id
-
-                if event_site in fc_settings.FULLCALENDAR_SITE_COLORS:
-                    color = fc_settings.FULLCALENDAR_SITE_COLORS[event_site]
-                    if type(color) == str:
-                        data['color'] = color
-                    else:
-                        if len(color) == 2:
-                            data['color'] = color[0]
-                            data['textColor'] = color[1]
-                        elif len(color) > 2:
-                            data['backgroundColor'] = color[0]
-                            data['textColor'] = color[1]
-                            data['borderColor'] = color[2]
-            else:
-                # Otherwise, use category color if set
-                if (occurrence.event.event_category and
-                        occurrence.event.event_category.color):
-                    data['color'] = occurrence.event.event_category.color
+            data.update(colors)
 
             events.append(data)
 
         return events
 
+    def get_data(self, context):
+        from fullcalendar.conf import settings as fc_settings
+        rows = self.get_rows(context)
+        site_colors = self.get_site_colors()
+
+        if self.get_format() == 'compact':
+            return self.get_compact_data(context, rows, site_colors)
+
+        if fc_settings.FULLCALENDAR_FEED_TABLE:
+            events = self.get_feed_entries(context, site_colors)
+        else:
+            events = []
+        instrumentation.record(rows=len(events) + len(rows))
+
+        with instrumentation.timing('serialization'):
+            events.extend(self.serialize_rows(rows, site_colors))
+
+        return events
+
+    def get_compact_data(self, context, rows, site_colors):
+        """
+            Returns the feed in the compact format, built from ``rows`` and,
+            with ``FULLCALENDAR_FEED_TABLE``, the feed entries.
+        """
+        from fullcalendar.conf import settings as fc_settings
+        feed = CompactFeed()
+
+        if fc_settings.FULLCALENDAR_FEED_TABLE:
+            entries = self.get_feed_entries(context, site_colors,
+                                            with_times=True)
+        else:
+            entries = []
+        instrumentation.record(rows=len(entries) + len(rows))
+
+        with instrumentation.timing('serialization'):
+            for start_time, end_time, data in entries:
+                event_id = data.pop('id')
+                title = data.pop('title')
+                url = data.pop('url')
+                del data['start'], data['end']
+                feed.add_url(event_id, title, start_time, end_time, url, data)
+
+            event_data = {}
+            for occurrence_id, title, start_time, end_time, event, \
+                    occurrence in rows:
+                if event.id not in event_data:
+                    event_data[event.id] = self.get_event_data(event,
+                                                               site_colors)
+                event_id, site_url, url_prefix, url_suffix, colors = \
+                    event_data[event.id]
+
+                if occurrence is not None:
+                    # Generated from a recurrence rule
+                    feed.add_url(event_id, title, start_time, end_time,
+                                 site_url + occurrence.get_absolute_url(),
+                                 colors)
+                else:
+                    feed.add(event_id, title, start_time, end_time,
+                             url_prefix, occurrence_id, url_suffix, colors)
+
+            return feed.as_data()
+
+
+class BatchJSONView(CalendarJSONView):
+    """
+        The calendar feed for several date ranges at once, e.g. for a page
+        showing a few months side by side. The ranges are given as
+        ``range=<start>,<end>`` parameters, in the formats of ``start`` and
+        ``end``, and may be narrowed down to some sites with ``site=<id>``
+        parameters.
+
+        All ranges are read with a single query, after merging the ones that
+        overlap, and the rows are serialized once. The response maps every
+        ``range`` parameter to the feed of that range.
+    """
+
+    max_ranges = 24
+
+    def get_ranges(self):
+        values = self.request.GET.getlist('range')
+        if not values:
+            raise Http404(_("No range specified"))
+        if len(values) > self.max_ranges:
+            raise Http404(_("More than {count} ranges specified").format(
+                count=self.max_ranges))
+
+        ranges = []
+        for value in values:
+            start, sep, end = value.partition(',')
+            if not sep:
+                raise Http404(_("Invalid range '{range}'").format(
+                    range=value))
+            ranges.append((value,) + self.parse_range(start, end))
+
+        return ranges
+
+    def get_site_ids(self):
+        try:
+            return [int(site_id)
+                    for site_id in self.request.GET.getlist('site')]
+        except ValueError:
+            raise Http404(_("Invalid site id"))
+
+    def get_spans(self, ranges):
+        """
+            Returns the periods covered by ``ranges``, merging the ranges
+            that overlap.
+        """
+
+        spans = []
+        for name, date_start, date_end in sorted(ranges, key=lambda r: r[1]):
+            if spans and date_start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], date_end)
+            else:
+                spans.append([date_start, date_end])
+
+        return spans
+
+    def get(self, request, *args, **kwargs):
+        ranges = self.get_ranges()
+        self.site_ids = self.get_site_ids()
+        self.spans = self.get_spans(ranges)
+
+        qs = self.get_queryset().filter(reduce(operator.or_, [
+            models.Q(end_time__gte=date_start, start_time__lte=date_end) &
+            self.get_range_filter(date_start, date_end)
+            for date_start, date_end in self.spans
+        ]))
+        if self.site_ids:
+            qs = qs.filter(site__id__in=self.site_ids)
+
+        context = {
+            'object_list': qs,
+            'date_start': self.spans[0][0],
+            'date_end': max(span[1] for span in self.spans),
+        }
+
+        return json_response(self.get_batch_data(context, ranges))
+
+    def get_feed_filter(self, context):
+        q = reduce(operator.or_, [
+            models.Q(end_time__gte=date_start, start_time__lte=date_end)
+            for date_start, date_end in self.spans
+        ])
+        if self.site_ids:
+            q &= models.Q(site__id__in=self.site_ids)
+
+        return q
+
+    def get_recurrence_rules(self):
+        rules = super(BatchJSONView, self).get_recurrence_rules()
+        if self.site_ids:
+            rules = rules.filter(event__site__id__in=self.site_ids)
+
+        return rules
+
+    def get_batch_data(self, context, ranges):
+        """
+            Returns the feed of every range, split from the rows of all
+            ranges.
+        """
+        from fullcalendar.conf import settings as fc_settings
+        rows = self.get_rows(context)
+        site_colors = self.get_site_colors()
+
+        if fc_settings.FULLCALENDAR_FEED_TABLE:
+            entries = self.get_feed_entries(context, site_colors,
+                                            with_times=True)
+        else:
+            entries = []
+        instrumentation.record(rows=len(entries) + len(rows))
+
+        with instrumentation.timing('serialization'):
+            entries.extend(
+                (row[2], row[3], data) for row, data
+                in zip(rows, self.serialize_rows(rows, site_colors))
+            )
+
+            return dict(
+                (name, [data for start_time, end_time, data in entries
+                        if end_time >= date_start and start_time <= date_end])
+                for name, date_start, date_end in ranges
+            )
+
+
+class OverviewJSONView(CalendarJSONView):
+    """
+        The number of occurrences starting on every day from ``start`` to
+        ``end``, e.g. to mark the busy days in a year overview, counted in
+        the database. See ``fullcalendar.overview``.
+
+        Optional parameters:
+
+        * ``period`` ``day`` (default) or ``week``
+        * ``by`` ``site`` or ``category``, to count per site or event
+          category
+    """
+
+    def get_period(self):
+        period = self.request.GET.get('period', 'day')
+        if period not in overview.PERIODS:
+            raise Http404(_("Invalid period '{period}'").format(
+                period=period))
+
+        return period
+
+    def get_breakdown(self):
+        by = self.request.GET.get('by')
+        if by is not None and by not in overview.BREAKDOWNS:
+            raise Http404(_("Invalid breakdown '{by}'").format(by=by))
+
+        return by
+
+    def get_cache_key(self):
+        return cache.make_key(
+            'overview',
+            current_site_id(),
+            self.get_start(),
+            self.get_end(),
+            self.get_period(),
+            self.get_breakdown(),
+            int(self.request.user.is_staff)
+        )
+
+    def get_data(self, context):
+        period = self.get_period()
+
+        return {
+            'period': period,
+            'counts': overview.count(
+                context['object_list'],
+                self.get_recurrence_rules(),
+                context['date_start'],
+                context['date_end'],
+                period,
+                self.get_breakdown()
+            ),
+        }
+
+
+class SyncJSONView(CalendarJSONView):
+    """
+        The stored occurrences that changed since a sync token, for clients
+        keeping a copy of the calendar. Requires
+        ``FULLCALENDAR_SYNC_RETENTION``, see ``fullcalendar.sync``.
+
+        The response contains:
+
+        * ``token`` To pass as ``since`` in the next request
+        * ``reset`` Whether the client has to drop its copy first. Set when
+          no ``since`` is given or it is older than the retention period;
+          ``updated`` then holds the occurrences in the ``start`` to ``end``
+          range instead of the changes.
+        * ``updated`` The new and changed occurrences in the calendar feed
+          format, with their id in ``occurrence``
+        * ``deleted`` The ids of the occurrences that were deleted or are no
+          longer visible to the user
+
+        Changes of an event count as changes of its occurrences.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not sync.is_enabled():
+            raise Http404(_("Sync is not enabled"))
+
+        started = timezone.now()
+        since = request.GET.get('since')
+
+        if since:
+            try:
+                since = sync.parse_token(since)
+            except ValueError:
+                raise Http404(_("Invalid sync token '{token}'").format(
+                    token=since))
+
+        reset = not since or sync.is_expired(since)
+
+        if reset:
+            occurrences = self.get_dated_items()[1]
+            deleted = []
+        else:
+            changed = (models.Q(updated__gt=since) |
+                       models.Q(event__updated__gt=since))
+            occurrences = self.get_queryset().filter(changed)
+            deleted = self.get_deleted(since, changed, occurrences)
+
+        rows = [
+            (occurrence.id, occurrence.title, occurrence.start_time,
+             occurrence.end_time, occurrence.event, None)
+            for occurrence in occurrences
+        ]
+        updated = self.serialize_rows(rows, self.get_site_colors())
+        for data, row in zip(updated, rows):
+            data['occurrence'] = str(row[0])
+
+        return json_response({
+            'token': sync.make_token(started),
+            'reset': reset,
+            'updated': updated,
+            'deleted': [str(pk) for pk in deleted],
+        })
+
+    def get_deleted(self, since, changed, visible):
+        """
+            Returns the ids of the occurrences deleted since ``since``, and
+            of the ``changed`` ones the user can no longer see.
+        """
+
+        tombstones = OccurrenceTombstone.objects.filter(deleted__gt=since)
+        if current_site_id() != settings.SITE_ID:
+            tombstones = tombstones.filter(site__id=current_site_id())
+
+        hidden = self.get_manager().filter(changed).exclude(
+            pk__in=visible.values('pk'))
+
+        return list(chain(
+            tombstones.values_list('occurrence_id', flat=True),
+            hidden.values_list('id', flat=True)
+        ))
+
 
 class CalendarView(YearMixin, MonthMixin, TemplateView):
     template_name = "events/calendar.html"
@@ -348,46 +954,344 @@ class CalendarView(YearMixin, MonthMixin, TemplateView):
         return context
 
 
-class AgendaView(ListView):
+# Format of the occurrence times in a pagination cursor, in UTC
+cursor_time_format = '%Y%m%dT%H%M%S%f'
+
+
+def make_cursor(occurrence):
+    """
+        Returns the pagination cursor pointing just after ``occurrence``.
+        The cursor of an occurrence generated from a recurrence rule ends
+        with the id of the rule prefixed with ``r``.
+    """
+
+    start_time, end_time, generated, pk = recurrence.sort_key(occurrence)
+    times = []
+    for value in (start_time, end_time):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.utc)
+        times.append(value.strftime(cursor_time_format))
+
+    return '{}_{}_{}{}'.format(times[0], times[1], 'r' if generated else '',
+                               pk)
+
+
+def parse_cursor(cursor):
+    """
+        Returns the ``recurrence.sort_key`` of a pagination cursor, or
+        raises ``ValueError`` if it is invalid.
+    """
+
+    start, end, pk = cursor.split('_')
+    start_time = datetime.strptime(start, cursor_time_format)
+    end_time = datetime.strptime(end, cursor_time_format)
+    generated = pk.startswith('r')
+
+    if settings.USE_TZ:
+        start_time = timezone.make_aware(start_time, timezone.utc)
+        end_time = timezone.make_aware(end_time, timezone.utc)
+
+    return start_time, end_time, int(generated), int(pk[generated:])
+
+
+class CursorPaginationMixin(object):
+    """
+        A mixin class for a list view of upcoming occurrences, as returned
+        by ``OccurrenceManager.upcoming_with_recurrences``, paginating by
+        cursor if ``cursor_pagination`` is set.
+
+        Occurrences are ordered by ``recurrence.sort_key`` and a page starts
+        after the occurrence in the ``cursor`` request parameter. A page is
+        a single indexed query, however deep it is, and the total number of
+        occurrences is never counted. The context contains ``next_cursor``
+        (``None`` on the last page) instead of ``paginator`` and
+        ``page_obj``.
+    """
+
+    cursor_pagination = False
+    cursor_kwarg = 'cursor'
+    next_cursor = None
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.cursor_pagination:
+            return super(CursorPaginationMixin, self).paginate_queryset(
+                queryset, page_size)
+
+        cursor = self.request.GET.get(self.cursor_kwarg)
+
+        if cursor:
+            try:
+                queryset = queryset.following(parse_cursor(cursor))
+            except ValueError:
+                raise Http404(_("Invalid cursor '{cursor}'").format(
+                    cursor=cursor))
+
+        # Fetch one extra occurrence to know if there is a next page
+        object_list = queryset[:page_size + 1]
+        if len(object_list) > page_size:
+            object_list = object_list[:page_size]
+            self.next_cursor = make_cursor(object_list[-1])
+
+        return (None, None, object_list, self.next_cursor is not None)
+
+    def get_context_data(self, **kwargs):
+        context = super(CursorPaginationMixin, self).get_context_data(
+            **kwargs)
+
+        if self.cursor_pagination:
+            context['next_cursor'] = self.next_cursor
+
+        return context
+
+
+class AgendaView(InstrumentedViewMixin, CursorPaginationMixin, ListView):
     context_object_name = "occurrence_list"
     paginate_by = 20
 
     def get_queryset(self):
         if current_site_id() == settings.SITE_ID:
-            return Occurrence.objects.upcoming(for_user=self.request.user)
+            manager = Occurrence.objects
         else:
-            return Occurrence.site_related.upcoming(for_user=self.request.user)
+            manager = Occurrence.site_related
+
+        return manager.upcoming_with_recurrences(for_user=self.request.user)
+
 
+class AgendaJSONView(JSONResponseMixin, AgendaView):
+    """
+        The upcoming occurrences as JSON, one page at a time. Always
+        paginated by cursor: the response contains the ``next`` cursor to
+        pass to get the following page, or ``null`` on the last page.
+    """
+
+    cursor_pagination = True
+
+    def render_to_response(self, context, **kwargs):
+        return self.render_to_json_response(context, **kwargs)
+
+    def get_data(self, context):
+        occurrences = context['object_list']
+        starts = format_datetimes(
+            [occurrence.start_time for occurrence in occurrences])
+        ends = format_datetimes(
+            [occurrence.end_time for occurrence in occurrences])
+
+        return {
+            'occurrences': [
+                {
+                    'id': str(occurrence.event_id),
+                    'title': occurrence.title,
+                    'start': start_json,
+                    'end': end_json,
+                    'url': "//" + occurrence.event.site.domain +
+                           occurrence.get_absolute_url(),
+                }
+                for occurrence, start_json, end_json
+                in zip(occurrences, starts, ends)
+            ],
+            'next': context['next_cursor'],
+        }
 
-class OccurrenceView(DetailView):
+
+class OccurrenceView(InstrumentedViewMixin, DetailView):
     context_object_name = 'occurrence'
 
     def get_queryset(self):
-        return Occurrence.objects.published(for_user=self.request.user).select_related('event').filter(
+        return Occurrence.objects.for_display(for_user=self.request.user).filter(
             event__slug=self.kwargs['event_slug'])
 
 
-def ical_view(request):
-    qs = Occurrence.site_related.published(for_user=request.user).filter(
+class RecurrenceView(OccurrenceView):
+    """
+        Detail view of an occurrence generated from a recurrence rule,
+        rendered with the template of stored occurrences.
+    """
+
+    def get_object(self, queryset=None):
+        rules = RecurrenceRule.objects.published(
+            for_user=self.request.user).filter(
+            event__slug=self.kwargs['event_slug'])
+        rule = get_object_or_404(rules, pk=self.kwargs['rule_id'])
+
+        try:
+            start_time = rule.parse_instance(self.kwargs['start'])
+        except ValueError:
+            raise Http404(_("Invalid occurrence"))
+
+        if not rule.is_instance(start_time):
+            raise Http404(_("Invalid occurrence"))
+
+        return rule.occurrence(start_time)
+
+
+# Number of events per chunk of a streamed iCalendar response
+ical_chunk_size = 100
+
+
+def get_feed_queryset(request):
+    return Occurrence.site_related.for_display(for_user=request.user).filter(
         start_time__gt=timezone.now() - timedelta(days=30)
     )
+
+
+@instrumented('view.ical_view')
+def ical_view(request):
+    from fullcalendar.conf import settings as fc_settings
+
+    qs = get_feed_queryset(request)
+    rules = Occurrence.site_related.get_recurrence_rules(for_user=request.user)
+    series = fc_settings.FULLCALENDAR_ICAL_RRULE
+
+    if series:
+        # Events with a stored recurrence rule are exported as a whole, so
+        # take all occurrences of those in the feed. Rules without COUNT or
+        # UNTIL are not exported, see Event.get_recurrence_rule.
+        recurring = qs.filter(
+            models.Q(event__recurrence__contains='COUNT=') |
+            models.Q(event__recurrence__contains='UNTIL=')
+        )
+        qs = Occurrence.site_related.for_display(for_user=request.user).filter(
+            models.Q(pk__in=qs.values('pk')) |
+            models.Q(event__in=recurring.values('event'))
+        ).order_by('event', 'start_time')
+
+    return conditional_response(request, get_validators(qs, rules),
+                                lambda: render_ical(qs, series, rules))
+
+
+def render_ical(qs, series=False, rules=()):
+    """
+        Returns a streaming iCalendar response for the occurrences in ``qs``.
+
+        The calendar header and footer are rendered once and the events are
+        emitted in chunks of ``ical_chunk_size`` while iterating the queryset,
+        which gives the same output as rendering a complete
+        ``icalendar.Calendar``.
+
+        If ``series`` is set, ``qs`` must be ordered by event and recurring
+        events are exported as a single event each, see ``ical_series``.
+
+        The recurrence ``rules`` are exported as a single event each if
+        ``series`` is set, otherwise their occurrences from 30 days ago up to
+        ``FULLCALENDAR_RECURRENCE_HORIZON`` from now are included.
+    """
+    from fullcalendar.conf import settings as fc_settings
+
     cal = icalendar.Calendar()
     cal.add('prodid', '-//JD-website//iCal Export//')
     cal.add('version', '2.0')
 
-    for item in qs:
-        event = icalendar.Event()
-        event.add('summary', item.title)
-        event.add('dtstart', item.start_time)
-        event.add('dtend', item.end_time)
+    end = b'END:VCALENDAR\r\n'
+    header = cal.to_ical()[:-len(end)]
+
+    if series:
+        events = chain(ical_series(qs), (ical_rule(rule) for rule in rules))
+    else:
+        now = timezone.now()
+        recurrences = recurrence.expand(
+            rules,
+            now - timedelta(days=30),
+            now + fc_settings.FULLCALENDAR_RECURRENCE_HORIZON
+        )
+        events = (
+            ical_event(item.title, item.start_time, item.end_time)
+            for item in chain(qs.iterator(), recurrences)
+        )
+
+    def stream():
+        yield header
+
+        chunk = []
+        for event in events:
+            chunk.append(event.to_ical())
+            if len(chunk) >= ical_chunk_size:
+                yield b''.join(chunk)
+                chunk = []
+
+        chunk.append(end)
+        yield b''.join(chunk)
+
+    return StreamingHttpResponse(stream(), content_type='text/calendar')
+
+
+def ical_event(summary, start_time, end_time):
+    event = icalendar.Event()
+    event.add('summary', summary)
+    event.add('dtstart', start_time)
+    event.add('dtend', end_time)
 
-        cal.add_component(event)
-    return HttpResponse(cal.to_ical(), content_type='text/calendar')
+    return event
 
+
+def ical_rule(rule):
+    vevent = ical_event(rule.event.title, rule.start_time, rule.end_time)
+    vevent.add('rrule', icalendar.vRecur.from_ical(rule.rule))
+
+    excluded = rule.get_excluded()
+    if excluded:
+        vevent.add('exdate', sorted(excluded))
+
+    return vevent
+
+
+def ical_series(qs):
+    """
+        Yields iCalendar events for the occurrences in ``qs``, ordered by
+        event. Events with a stored recurrence rule with ``COUNT`` or
+        ``UNTIL`` become one event with an RRULE:
+
+        * occurrences of the rule that were removed are listed in EXDATE,
+        * extra occurrences with the same title and duration in RDATE,
+        * occurrences that were moved, resized or have their own title are
+          exported as separate events, like events without a rule.
+    """
+
+    for event, occurrences in groupby(qs.iterator(), lambda o: o.event):
+        rule = event.get_recurrence_rule()
+
+        if rule is None:
+            for item in occurrences:
+                yield ical_event(item.title, item.start_time, item.end_time)
+            continue
+
+        expected = set(rule)
+        duration = event.recurrence_end - event.recurrence_start
+        found = set()
+        rdates = []
+        separate = []
+
+        for item in occurrences:
+            if (item.title != event.title or
+                    item.end_time - item.start_time != duration):
+                separate.append(item)
+            elif item.start_time in expected:
+                found.add(item.start_time)
+            else:
+                rdates.append(item.start_time)
+
+        if found or rdates:
+            vevent = ical_event(event.title, event.recurrence_start,
+                                event.recurrence_end)
+            vevent.add('rrule', icalendar.vRecur.from_ical(event.recurrence))
+            if expected - found:
+                vevent.add('exdate', sorted(expected - found))
+            if rdates:
+                vevent.add('rdate', rdates)
+            yield vevent
+
+        for item in separate:
+            yield ical_event(item.title, item.start_time, item.end_time)
+
+
+@instrumented('view.html_view')
 def html_view(request):
-    qs = Occurrence.site_related.published(for_user=request.user).filter(
-        start_time__gt=timezone.now() - timedelta(days=30)
-    )
+    qs = get_feed_queryset(request)
+
+    return conditional_response(request, get_validators(qs),
+                                lambda: render_html(qs))
+
+
+def render_html(qs):
     output = "<h2>Agenda</h2>"
     for item in qs:
         output += "<h3>{0}: {1}</h3>".format(item.start_time.strftime("%x"),
@@ -38,8 +38,11 @@ setup(
     ),
     packages=[
         'fullcalendar',
+        'fullcalendar.management',
+        'fullcalendar.management.commands',
         'fullcalendar.migrations',
         'fullcalendar.templatetags'
     ],
-    install_requires=['python-dateutil', 'django>=1.6', 'mezzanine>=3.1']
+    package_data={'fullcalendar': ['static/fullcalendar/js/*.js']},
+    install_requires=['python-dateutil>=2.7', 'django>=1.6', 'mezzanine>=3.1']
 )